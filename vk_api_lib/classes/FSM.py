@@ -1,67 +1,647 @@
+import asyncio
+import base64
+import json
+import os
+import time
+import traceback
+import uuid
+
 from redis import asyncio as aioredis
+
+from loader import logger
+from vk_api_lib.classes.cache import NO_EXPIRY, TTLCache
+from vk_api_lib.classes.codecs import Codec, StrCodec
 # from vk_api_lib.classes.states import State
 
 
+STATE_FIELD = '__state__'
+
+
+def to_raw(value) -> str | bytes:
+    return value if type(value) in (str, bytes) else str(value)
+
+
+def to_str(value: str | bytes | None) -> str | None:
+    return value.decode() if type(value) is bytes else value
+
+
 class FSM:
-    async def get(self, key: str): pass
-    async def set(self, key: str, value): pass
-    async def set_hash(self, key: str, data: dict): pass
-    async def get_hash(self, key: str) -> dict: pass
+    state_ttl: int | None = None
+    data_ttl: int | None = None
+    single_key: bool = False
+    codec: Codec = StrCodec()
+
+    async def get(self, key: str, ttl: int | None = None): pass
+    async def set(self, key: str, value, ttl: int | None = None): pass
+    async def set_hash(self, key: str, data: dict, ttl: int | None = None): pass
+    async def get_hash(self, key: str, ttl: int | None = None) -> dict: pass
+    async def get_hash_field(self, key: str, field: str, ttl: int | None = None): pass
+    async def incr_hash_field(self, key: str, field: str, amount: int | float = 1,
+                              ttl: int | None = None) -> int | float: pass
+    async def delete_hash_fields(self, key: str, fields: list[str]): pass
     async def delete(self, key: str): pass
     async def init_redis(self, url: str = "redis://localhost", db: int = 1): pass
-    def get_context(self, peer_id: int, user_id: int): pass
+    def get_context(self, peer_id: int, user_id: int, buffered: bool = False): pass
+
+    async def get_with_hash(self, key: str, hash_key: str, ttl: int | None = None,
+                            hash_ttl: int | None = None) -> tuple[str | None, dict]:
+        return await self.get(key, ttl), await self.get_hash(hash_key, hash_ttl)
+
+    async def write(self, values: dict[str, str], hashes: dict[str, dict], deleted: list[str],
+                    ttls: dict[str, int] = None, deleted_fields: dict[str, list[str]] = None):
+        ttls = ttls or {}
+        for key in deleted:
+            await self.delete(key)
+        for key, value in values.items():
+            await self.set(key, value, ttls.get(key))
+        for key, data in hashes.items():
+            await self.set_hash(key, data, ttls.get(key))
+        for key, fields in (deleted_fields or {}).items():
+            await self.delete_hash_fields(key, fields)
 
 
 class SimpleRedisFSM(FSM):
     def __init__(
             self,
-            prefix: str = 'vk_fsm_'):
+            prefix: str = 'vk_fsm_',
+            state_ttl: int | None = None,
+            data_ttl: int | None = None,
+            single_key: bool = False,
+            codec: Codec = None):
         self.prefix = prefix
         self.redis = None
+        self.state_ttl = state_ttl
+        self.data_ttl = data_ttl
+        self.single_key = single_key
+        self.codec = codec if codec is not None else StrCodec()
 
     async def init_redis(self, url: str = "redis://localhost", db: int = 1):
-        self.redis = await aioredis.from_url(url, encoding='utf-8', db=db, decode_responses=True)
+        self.redis = await aioredis.from_url(
+            url, encoding='utf-8', db=db, decode_responses=not self.codec.binary
+        )
+
+    async def get(self, key: str, ttl: int | None = None):
+        if ttl is None:
+            return await self.redis.get(self.prefix + key)
+        async with self.redis.pipeline(transaction=False) as pipe:
+            pipe.get(self.prefix + key)
+            pipe.expire(self.prefix + key, ttl)
+            value, _ = await pipe.execute()
+        return value
 
-    async def get(self, key: str):
-        return await self.redis.get(self.prefix + key)
+    async def set(self, key: str, value, ttl: int | None = None):
+        await self.redis.set(self.prefix + key, value, ex=ttl)
 
-    async def set(self, key: str, value):
-        await self.redis.set(self.prefix + key, value)
+    async def set_hash(self, key: str, data: dict, ttl: int | None = None):
+        await self.write({}, {key: data}, [], {key: ttl} if ttl else None)
 
-    async def set_hash(self, key: str, data: dict):
-        await self.redis.hmset(self.prefix + key, data)
+    async def get_hash(self, key: str, ttl: int | None = None) -> dict:
+        if ttl is None:
+            return await self.redis.hgetall(self.prefix + key)
+        async with self.redis.pipeline(transaction=False) as pipe:
+            pipe.hgetall(self.prefix + key)
+            pipe.expire(self.prefix + key, ttl)
+            data, _ = await pipe.execute()
+        return data
+
+    async def get_hash_field(self, key: str, field: str, ttl: int | None = None):
+        if ttl is None:
+            return await self.redis.hget(self.prefix + key, field)
+        async with self.redis.pipeline(transaction=False) as pipe:
+            pipe.hget(self.prefix + key, field)
+            pipe.expire(self.prefix + key, ttl)
+            value, _ = await pipe.execute()
+        return value
 
-    async def get_hash(self, key: str) -> dict:
-        return await self.redis.hgetall(self.prefix + key)
+    async def incr_hash_field(self, key: str, field: str, amount: int | float = 1,
+                              ttl: int | None = None) -> int | float:
+        async with self.redis.pipeline(transaction=True) as pipe:
+            if type(amount) is float:
+                pipe.hincrbyfloat(self.prefix + key, field, amount)
+            else:
+                pipe.hincrby(self.prefix + key, field, amount)
+            if ttl is not None:
+                pipe.expire(self.prefix + key, ttl)
+            value, *_ = await pipe.execute()
+        return value
+
+    async def delete_hash_fields(self, key: str, fields: list[str]):
+        return await self.redis.hdel(self.prefix + key, *fields)
 
     async def delete(self, key: str):
         return await self.redis.delete(self.prefix + key)
 
-    def get_context(self, peer_id: int, user_id: int):
+    async def get_with_hash(self, key: str, hash_key: str, ttl: int | None = None,
+                            hash_ttl: int | None = None) -> tuple[str | None, dict]:
+        async with self.redis.pipeline(transaction=False) as pipe:
+            pipe.get(self.prefix + key)
+            pipe.hgetall(self.prefix + hash_key)
+            if ttl is not None:
+                pipe.expire(self.prefix + key, ttl)
+            if hash_ttl is not None:
+                pipe.expire(self.prefix + hash_key, hash_ttl)
+            value, data, *_ = await pipe.execute()
+        return value, data
+
+    def fill_pipeline(self, pipe, values: dict[str, str], hashes: dict[str, dict], deleted: list[str],
+                      ttls: dict[str, int] = None, deleted_fields: dict[str, list[str]] = None):
+        ttls = ttls or {}
+        for key in deleted:
+            pipe.delete(self.prefix + key)
+        for key, value in values.items():
+            pipe.set(self.prefix + key, value, ex=ttls.get(key))
+        for key, data in hashes.items():
+            pipe.hset(self.prefix + key, mapping=data)
+            if ttls.get(key):
+                pipe.expire(self.prefix + key, ttls[key])
+        for key, fields in (deleted_fields or {}).items():
+            pipe.hdel(self.prefix + key, *fields)
+
+    async def write(self, values: dict[str, str], hashes: dict[str, dict], deleted: list[str],
+                    ttls: dict[str, int] = None, deleted_fields: dict[str, list[str]] = None):
+        async with self.redis.pipeline(transaction=True) as pipe:
+            self.fill_pipeline(pipe, values, hashes, deleted, ttls, deleted_fields)
+            await pipe.execute()
+
+    # Safe to run against a live bot once every worker uses single_key=True: fields already
+    # written in the single-hash layout win over legacy values (HSETNX). A field deleted in the
+    # new layout before its conversation is compacted can reappear from the legacy keys.
+    async def compact(self, batch_size: int = 500) -> int:
+        ttl = self.data_ttl or self.state_ttl
+        bases = set()
+        for postfix in ('state', 'data'):
+            async for key in self.redis.scan_iter(match=self.prefix + '*' + postfix, count=batch_size):
+                bases.add(to_str(key)[len(self.prefix):-len(postfix)])
+
+        migrated = 0
+        for base in bases:
+            state, data = await self.get_with_hash(base + 'state', base + 'data')
+            if state is not None:
+                data[STATE_FIELD] = state
+            async with self.redis.pipeline(transaction=True) as pipe:
+                pipe.delete(self.prefix + base + 'state', self.prefix + base + 'data')
+                if data:
+                    for field, value in data.items():
+                        pipe.hsetnx(self.prefix + base, field, value)
+                    if ttl:
+                        pipe.expire(self.prefix + base, ttl)
+                await pipe.execute()
+            migrated += 1
+        return migrated
+
+    def get_context(self, peer_id: int, user_id: int, buffered: bool = False):
+        return FSMContext(
+            self, peer_id, user_id, buffered
+        )
+
+
+class MemoryFSM(FSM):
+    def __init__(
+            self,
+            maxsize: int = 100000,
+            ttl: float | None = None,
+            snapshot_path: str | None = None,
+            state_ttl: int | None = None,
+            data_ttl: int | None = None,
+            single_key: bool = False,
+            codec: Codec = None):
+        self.storage = TTLCache(maxsize, ttl)
+        self.snapshot_path = snapshot_path
+        self.state_ttl = state_ttl
+        self.data_ttl = data_ttl
+        self.single_key = single_key
+        self.codec = codec if codec is not None else StrCodec()
+
+    def touch(self, key: str, ttl: float | None):
+        value = self.storage.get(key)
+        if ttl is not None and value is not None:
+            self.storage.set(key, value, ttl)
+        return value
+
+    async def init_redis(self, url: str = "redis://localhost", db: int = 1):
+        pass
+
+    async def get(self, key: str, ttl: float | None = None):
+        return self.touch(key, ttl)
+
+    async def set(self, key: str, value, ttl: float | None = None):
+        self.storage.set(key, to_raw(value), ttl)
+
+    async def set_hash(self, key: str, data: dict, ttl: float | None = None):
+        hash_ = self.storage.get(key)
+        if type(hash_) is not dict:
+            hash_ = {}
+        hash_.update({field: to_raw(value) for field, value in data.items()})
+        self.storage.set(key, hash_, ttl)
+
+    async def get_hash(self, key: str, ttl: float | None = None) -> dict:
+        hash_ = self.touch(key, ttl)
+        return dict(hash_) if type(hash_) is dict else {}
+
+    async def get_hash_field(self, key: str, field: str, ttl: float | None = None):
+        hash_ = self.touch(key, ttl)
+        return hash_.get(field) if type(hash_) is dict else None
+
+    async def incr_hash_field(self, key: str, field: str, amount: int | float = 1,
+                              ttl: float | None = None) -> int | float:
+        hash_ = self.touch(key, ttl)
+        if type(hash_) is not dict:
+            hash_ = {}
+            self.storage.set(key, hash_, ttl)
+        value = type(amount)(hash_.get(field, 0)) + amount
+        hash_[field] = str(value)
+        return value
+
+    async def delete_hash_fields(self, key: str, fields: list[str]):
+        hash_ = self.storage.get(key)
+        if type(hash_) is not dict:
+            return 0
+        deleted = sum(hash_.pop(field, None) is not None for field in fields)
+        if not hash_:
+            self.storage.pop(key)
+        return deleted
+
+    async def delete(self, key: str):
+        return int(self.storage.pop(key) is not None)
+
+    def expire(self, key: str, ttl: float) -> bool:
+        return self.touch(key, ttl) is not None
+
+    def get_context(self, peer_id: int, user_id: int, buffered: bool = False):
+        return FSMContext(
+            self, peer_id, user_id, buffered
+        )
+
+    def dump(self) -> list[tuple[str, float | None, str | dict]]:
+        now, wall_now = time.monotonic(), time.time()
+        return [
+            (key, expires - now + wall_now if expires is not None else None, value)
+            for key, (expires, value) in self.storage.data.items()
+            if expires is None or expires > now
+        ]
+
+    def restore(self, items: list[tuple[str, float | None, str | dict]]) -> None:
+        wall_now = time.time()
+        for key, expires, value in items:
+            if expires is None:
+                self.storage.set(key, value, NO_EXPIRY)
+            elif expires > wall_now:
+                self.storage.set(key, value, expires - wall_now)
+
+    @staticmethod
+    def encode_snapshot_value(value: str | bytes | dict):
+        if type(value) is dict:
+            return {'h': {field: MemoryFSM.encode_snapshot_value(raw) for field, raw in value.items()}}
+        if type(value) is bytes:
+            return {'b': base64.b64encode(value).decode()}
+        return {'s': value}
+
+    @staticmethod
+    def decode_snapshot_value(value: dict) -> str | bytes | dict:
+        if 'h' in value:
+            return {field: MemoryFSM.decode_snapshot_value(raw) for field, raw in value['h'].items()}
+        if 'b' in value:
+            return base64.b64decode(value['b'])
+        return value['s']
+
+    def write_snapshot(self, path: str, items: list) -> None:
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as file:
+            json.dump([
+                [key, expires, self.encode_snapshot_value(value)] for key, expires, value in items
+            ], file)
+        os.replace(tmp_path, path)
+
+    def read_snapshot(self, path: str) -> list:
+        if not os.path.exists(path):
+            return []
+        with open(path, encoding='utf-8') as file:
+            return [
+                (key, expires, self.decode_snapshot_value(value)) for key, expires, value in json.load(file)
+            ]
+
+    async def save_snapshot(self, path: str | None = None) -> None:
+        await asyncio.to_thread(self.write_snapshot, path or self.snapshot_path, self.dump())
+
+    async def load_snapshot(self, path: str | None = None) -> None:
+        self.restore(await asyncio.to_thread(self.read_snapshot, path or self.snapshot_path))
+
+    async def close(self) -> None:
+        if self.snapshot_path:
+            await self.save_snapshot()
+
+
+class TieredFSM(FSM):
+    missing = object()
+
+    def __init__(
+            self,
+            backend: SimpleRedisFSM = None,
+            maxsize: int = 10000,
+            ttl: float | None = 30,
+            channel: str = 'vk_fsm_invalidate',
+            touch_interval: float = 60):
+        self.backend = backend if backend is not None else SimpleRedisFSM()
+        self.state_ttl = self.backend.state_ttl
+        self.data_ttl = self.backend.data_ttl
+        self.single_key = self.backend.single_key
+        self.codec = self.backend.codec
+        self.local = TTLCache(maxsize, ttl)
+        self.channel = channel
+        self.worker_id = uuid.uuid4().hex
+        self.generation = 0
+        self.listener: asyncio.Task | None = None
+        self.hits = 0
+        self.misses = 0
+        self.touched = TTLCache(maxsize, touch_interval)
+        self.pending_touches: dict[str, int] = {}
+        self.touch_task: asyncio.Task | None = None
+
+    async def init_redis(self, url: str = "redis://localhost", db: int = 1):
+        if self.backend.redis is None:
+            await self.backend.init_redis(url, db)
+        if self.listener is None:
+            self.listener = asyncio.create_task(self.listen())
+
+    async def close(self):
+        if self.listener is not None:
+            self.listener.cancel()
+            await asyncio.gather(self.listener, return_exceptions=True)
+            self.listener = None
+        if self.touch_task is not None:
+            self.touch_task.cancel()
+            await asyncio.gather(self.touch_task, return_exceptions=True)
+            self.touch_task = None
+
+    async def listen(self):
+        while True:
+            try:
+                async with self.backend.redis.pubsub() as pubsub:
+                    await pubsub.subscribe(self.channel)
+                    self.invalidate_all()
+                    async for message in pubsub.listen():
+                        if message['type'] != 'message':
+                            continue
+                        sender, _, keys = to_str(message['data']).partition('|')
+                        if sender != self.worker_id:
+                            self.invalidate(keys.split('\n'))
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.error(f'f"EXCEPTION {traceback.format_exc()} - - - fsm invalidation listener"')
+                self.invalidate_all()
+                await asyncio.sleep(1)
+
+    def invalidate(self, keys: list[str]):
+        self.generation += 1
+        for key in keys:
+            self.local.pop(key)
+
+    def invalidate_all(self):
+        self.generation += 1
+        self.local.clear()
+
+    def get_local(self, key: str):
+        value = self.local.get(key, self.missing)
+        if value is self.missing:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    def touch(self, key: str, ttl: int | None):
+        if ttl is None or key in self.touched:
+            return
+        self.touched.set(key, True)
+        self.pending_touches[key] = ttl
+        if self.touch_task is None:
+            self.touch_task = asyncio.create_task(self.flush_touches())
+
+    async def flush_touches(self):
+        try:
+            await asyncio.sleep(0)
+            touches, self.pending_touches = self.pending_touches, {}
+            self.touch_task = None
+            async with self.backend.redis.pipeline(transaction=False) as pipe:
+                for key, ttl in touches.items():
+                    pipe.expire(self.backend.prefix + key, ttl)
+                await pipe.execute()
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.error(f'f"EXCEPTION {traceback.format_exc()} - - - fsm ttl refresh"')
+
+    async def get(self, key: str, ttl: int | None = None):
+        value = self.get_local(key)
+        if value is not self.missing:
+            self.touch(key, ttl)
+            return value
+
+        generation = self.generation
+        value = await self.backend.get(key, ttl)
+        if generation == self.generation:
+            self.local.set(key, value)
+        return value
+
+    async def get_hash(self, key: str, ttl: int | None = None) -> dict:
+        data = self.get_local(key)
+        if data is not self.missing:
+            self.touch(key, ttl)
+            return dict(data)
+
+        generation = self.generation
+        data = await self.backend.get_hash(key, ttl)
+        if generation == self.generation:
+            self.local.set(key, dict(data))
+        return data
+
+    async def get_hash_field(self, key: str, field: str, ttl: int | None = None):
+        data = self.get_local(key)
+        if type(data) is dict:
+            self.touch(key, ttl)
+            return data.get(field)
+        return await self.backend.get_hash_field(key, field, ttl)
+
+    async def get_with_hash(self, key: str, hash_key: str, ttl: int | None = None,
+                            hash_ttl: int | None = None) -> tuple[str | None, dict]:
+        value, data = self.get_local(key), self.get_local(hash_key)
+        if value is not self.missing and data is not self.missing:
+            self.touch(key, ttl)
+            self.touch(hash_key, hash_ttl)
+            return value, dict(data)
+
+        generation = self.generation
+        value, data = await self.backend.get_with_hash(key, hash_key, ttl, hash_ttl)
+        if generation == self.generation:
+            self.local.set(key, value)
+            self.local.set(hash_key, dict(data))
+        return value, data
+
+    async def write(self, values: dict[str, str], hashes: dict[str, dict], deleted: list[str],
+                    ttls: dict[str, int] = None, deleted_fields: dict[str, list[str]] = None):
+        deleted_fields = deleted_fields or {}
+        keys = [*deleted, *values, *hashes, *deleted_fields]
+        async with self.backend.redis.pipeline(transaction=True) as pipe:
+            self.backend.fill_pipeline(pipe, values, hashes, deleted, ttls, deleted_fields)
+            pipe.publish(self.channel, self.worker_id + '|' + '\n'.join(keys))
+            await pipe.execute()
+
+        self.generation += 1
+        for key in deleted:
+            self.local.pop(key)
+        for key, value in values.items():
+            self.local.set(key, to_raw(value))
+        for key, data in hashes.items():
+            cached = self.local.get(key)
+            if cached is not None:
+                cached.update({field: to_raw(value) for field, value in data.items()})
+        for key, fields in deleted_fields.items():
+            cached = self.local.get(key)
+            if cached is not None:
+                for field in fields:
+                    cached.pop(field, None)
+
+    async def set(self, key: str, value, ttl: int | None = None):
+        await self.write({key: value}, {}, [], {key: ttl} if ttl else None)
+
+    async def set_hash(self, key: str, data: dict, ttl: int | None = None):
+        await self.write({}, {key: data}, [], {key: ttl} if ttl else None)
+
+    async def delete(self, key: str):
+        await self.write({}, {}, [key])
+
+    async def incr_hash_field(self, key: str, field: str, amount: int | float = 1,
+                              ttl: int | None = None) -> int | float:
+        prefix = self.backend.prefix
+        async with self.backend.redis.pipeline(transaction=True) as pipe:
+            if type(amount) is float:
+                pipe.hincrbyfloat(prefix + key, field, amount)
+            else:
+                pipe.hincrby(prefix + key, field, amount)
+            if ttl is not None:
+                pipe.expire(prefix + key, ttl)
+            pipe.publish(self.channel, self.worker_id + '|' + key)
+            value, *_ = await pipe.execute()
+
+        self.generation += 1
+        cached = self.local.get(key)
+        if cached is not None:
+            cached[field] = str(value)
+        return value
+
+    def get_context(self, peer_id: int, user_id: int, buffered: bool = False):
         return FSMContext(
-            self, peer_id, user_id
+            self, peer_id, user_id, buffered
         )
 
 
 class FSMContext:
-    def __init__(self, fsm: FSM, peer_id: int, user_id: int):
+    def __init__(self, fsm: FSM, peer_id: int, user_id: int, buffered: bool = False):
         self.peer_id = peer_id
         self.user_id = user_id
         self.fsm = fsm
         self.key = f'{peer_id}_{user_id}'
+        self.buffered = buffered
+        self.codec = fsm.codec
+        self.single_key = fsm.single_key
+        if self.single_key:
+            self.state_key = self.data_key = self.key
+            self.state_ttl = self.data_ttl = fsm.data_ttl or fsm.state_ttl
+        else:
+            self.state_key = self.key + 'state'
+            self.data_key = self.key + 'data'
+            self.state_ttl = fsm.state_ttl
+            self.data_ttl = fsm.data_ttl
+        self.loaded = False
+        self.state: str | None = None
+        self.data: dict = {}
+        self.state_changed = False
+        self.data_dropped = False
+        self.changed_fields: set[str] = set()
+
+    async def load(self):
+        if self.loaded:
+            return
+        if self.single_key:
+            data = await self.fsm.get_hash(self.key, self.data_ttl)
+            data = {to_str(field): raw for field, raw in (data or {}).items()}
+            state = data.pop(STATE_FIELD, None) or None
+        else:
+            state, data = await self.fsm.get_with_hash(self.state_key, self.data_key, self.state_ttl, self.data_ttl)
+            data = {to_str(field): raw for field, raw in (data or {}).items()}
+        if not self.state_changed:
+            self.state = to_str(state)
+        if not self.data_dropped:
+            data = self.codec.decode_hash(data)
+            data.update({field: self.data[field] for field in self.changed_fields})
+            self.data = data
+        self.loaded = True
+
+    def get_changes(self) -> tuple[dict, dict, list, dict]:
+        values, hashes, deleted, deleted_fields = {}, {}, [], {}
+        data = self.codec.encode_hash({field: self.data[field] for field in self.changed_fields})
+
+        if self.single_key:
+            if self.data_dropped:
+                deleted.append(self.key)
+                if self.state is not None:
+                    data[STATE_FIELD] = self.state
+            if self.state_changed:
+                if self.state is not None:
+                    data[STATE_FIELD] = self.state
+                elif not self.data_dropped:
+                    deleted_fields[self.key] = [STATE_FIELD]
+            if data:
+                hashes[self.key] = data
+            return values, hashes, deleted, deleted_fields
+
+        if self.state_changed:
+            if self.state is None:
+                deleted.append(self.state_key)
+            else:
+                values[self.state_key] = self.state
+        if self.data_dropped:
+            deleted.append(self.data_key)
+        if data:
+            hashes[self.data_key] = data
+        return values, hashes, deleted, deleted_fields
+
+    def get_ttls(self) -> dict[str, int]:
+        ttls = {}
+        if self.state_ttl:
+            ttls[self.state_key] = self.state_ttl
+        if self.data_ttl:
+            ttls[self.data_key] = self.data_ttl
+        return ttls
+
+    async def flush(self):
+        if not (self.state_changed or self.data_dropped or self.changed_fields):
+            return
+
+        values, hashes, deleted, deleted_fields = self.get_changes()
+        await self.fsm.write(values, hashes, deleted, self.get_ttls(), deleted_fields)
+        self.state_changed = False
+        self.data_dropped = False
+        self.changed_fields = set()
+
+    async def changed(self):
+        if not self.buffered:
+            await self.flush()
+
+    def normalize(self, data: dict) -> dict:
+        return {field: self.codec.decode_field(field, self.codec.encode_field(field, value))
+                for field, value in data.items()}
 
     async def set_data(self, **kwargs):
-        postfix = 'data'
         if not kwargs:
             return
-        await self.fsm.set_hash(self.key + postfix, kwargs)
+        self.data.update(self.normalize(kwargs))
+        self.changed_fields.update(kwargs)
+        await self.changed()
 
     async def get_data(self):
-        postfix = 'data'
-        data = await self.fsm.get_hash(self.key + postfix)
-        if data is None:
-            data = {}
-        return data
+        await self.load()
+        return dict(self.data)
 
     # async def set_state_form(self, form: StateForm):
     #     postfix = 'state'
@@ -70,27 +650,54 @@ class FSMContext:
     #     await self.fsm.set()
 
     async def get_state(self):
-        postfix = 'state'
-        return await self.fsm.get(self.key + postfix)
+        await self.load()
+        return self.state
 
     async def set_state(self, state: 'State'):
-        postfix = 'state'
-        return await self.fsm.set(self.key + postfix, state.name)
+        self.state = state.name
+        self.state_changed = True
+        await self.changed()
 
     async def drop_state(self):
-        postfix = 'state'
-        return await self.fsm.delete(self.key + postfix)
+        self.state = None
+        self.state_changed = True
+        await self.changed()
 
     async def drop_data(self):
-        postfix = 'data'
-        return await self.fsm.delete(self.key + postfix)
+        if self.single_key and not (self.loaded or self.state_changed):
+            await self.load()
+        self.data = {}
+        self.changed_fields = set()
+        self.data_dropped = True
+        await self.changed()
 
     async def update_data(self, **kwargs):
-        data: dict = await self.get_data()
-        if data:
-            data.update(kwargs)
-            await self.set_data(**data)
+        await self.set_data(**kwargs)
+
+    async def set_state_and_data(self, state: 'State', **kwargs):
+        self.state = state.name
+        self.state_changed = True
+        self.data.update(self.normalize(kwargs))
+        self.changed_fields.update(kwargs)
+        await self.changed()
+
+    async def get_field(self, name: str, type_: type = None, default=None):
+        if self.loaded or name in self.changed_fields or self.data_dropped:
+            value = self.data.get(name)
         else:
-            await self.set_data(**kwargs)
+            value = self.codec.decode_field(name, await self.fsm.get_hash_field(self.data_key, name, self.data_ttl))
+
+        if value is None:
+            return default
+        return type_(value) if type_ is not None else value
 
+    async def incr_field(self, name: str, amount: int | float = 1) -> int | float:
+        if self.codec.binary:
+            raise TypeError(f'incr_field is not supported by {self.codec.__class__.__name__}')
+        if self.data_dropped or self.changed_fields:
+            await self.flush()
 
+        value = await self.fsm.incr_hash_field(self.data_key, name, amount, self.data_ttl)
+        if self.loaded:
+            self.data[name] = value
+        return value
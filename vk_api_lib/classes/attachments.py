@@ -25,7 +25,7 @@ class Photo:
 
     @property
     def data(self):
-        return f'photo{self.owner_id}_{self.id_}'
+        return f'photo{self.owner_id}_{self.id}'
 
     @classmethod
     def from_message_handler(cls, photo: dict):
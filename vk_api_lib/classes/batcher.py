@@ -0,0 +1,95 @@
+import asyncio
+import json
+
+from vk_api_lib.classes.rate_limiter import Priority
+from vk_api_lib.classes.urls import VK_API_EXECUTE_PATH
+
+
+class ExecuteBatcher:
+    max_execute_calls = 25
+
+    def __init__(self, bot, delay: float = 0.01, max_calls: int = 25):
+        self.bot = bot
+        self.delay = delay
+        self.max_calls = min(max_calls, self.max_execute_calls)
+        self.pending: list[tuple[str, dict, int, asyncio.Future]] = []
+        self.timer: asyncio.TimerHandle | None = None
+        self.tasks: set[asyncio.Task] = set()
+
+    async def request(self, path: str, data: dict, priority: int = Priority.default) -> dict:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self.pending.append((path, data, priority, future))
+
+        if len(self.pending) >= self.max_calls:
+            self.flush()
+        elif self.timer is None:
+            self.timer = loop.call_later(self.delay, self.flush)
+
+        return await future
+
+    def flush(self) -> None:
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+
+        calls, self.pending = self.pending, []
+        if not calls:
+            return
+
+        task = asyncio.create_task(self.send(calls))
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+
+    async def close(self) -> None:
+        self.flush()
+        if self.tasks:
+            await asyncio.gather(*self.tasks, return_exceptions=True)
+
+    @staticmethod
+    def get_code(calls: list[tuple[str, dict, int, asyncio.Future]]) -> str:
+        methods = []
+        for path, data, _, _ in calls:
+            params = json.dumps(data, ensure_ascii=False, separators=(',', ':'))
+            methods.append(f'API.{path.lstrip("/")}({params})')
+        return f'return [{",".join(methods)}];'
+
+    async def send(self, calls: list[tuple[str, dict, int, asyncio.Future]]) -> None:
+        priority = min(call[2] for call in calls)
+        try:
+            if len(calls) == 1:
+                path, data, _, future = calls[0]
+                resp = await self.bot.send_request(path, data, priority)
+                if not future.done():
+                    future.set_result(resp)
+                return
+
+            resp = await self.bot.send_request(VK_API_EXECUTE_PATH, {'code': self.get_code(calls)}, priority)
+        except Exception as e:
+            for _, _, _, future in calls:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        if 'response' not in resp:
+            for _, _, _, future in calls:
+                if not future.done():
+                    future.set_result(resp)
+            return
+
+        errors = iter(resp.get('execute_errors', []))
+        results = resp['response'] if type(resp['response']) is list else []
+        for i, (path, _, _, future) in enumerate(calls):
+            result = results[i] if i < len(results) else False
+            if result is False:
+                error = next(errors, None) or {
+                    'method': path.lstrip('/'),
+                    'error_code': 0,
+                    'error_msg': 'execute call failed'
+                }
+                result = {'error': error}
+            else:
+                result = {'response': result}
+
+            if not future.done():
+                future.set_result(result)
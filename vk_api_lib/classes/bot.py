@@ -1,18 +1,33 @@
+import asyncio
+import io
 import json
 import logging
+import os
 import random
+from collections import Counter, deque
+from typing import AsyncIterable, AsyncIterator, BinaryIO
 
 import aiohttp
 from aiohttp import FormData
 
 from vk_api_lib.classes.urls import VK_API_SEND_MESSAGE_PATH, VK_API_URL, VK_API_DELETE_MESSAGE_PATH, VK_API_EDIT_MESSAGE_PATH, \
     VK_API_GET_MESSAGE_BY_CONSERVATION_ID_PATH, VK_API_GET_UPLOAD_SERVER_PHOTO_PATH, VK_API_SAVE_MESSAGE_PHOTO_PATH, \
-    VK_API_GET_USERS_PATH
+    VK_API_GET_USERS_PATH, VK_API_EXECUTE_PATH
 
 from vk_api_lib.classes.attachments import Photo, Video
+from vk_api_lib.classes.batcher import ExecuteBatcher
+from vk_api_lib.classes.broadcast import BroadcastResult, BROADCAST_CHUNK_SIZE
+from vk_api_lib.classes.cache import TTLCache
+from vk_api_lib.classes.edits import EDIT_COALESCE_DELAY, PendingEdit, get_edit_key, get_photos_key
 from vk_api_lib.classes.handler import MainHandler
 from vk_api_lib.classes.keyboard import Keyboard
 from vk_api_lib.classes.message import Message
+from vk_api_lib.classes.photo_cache import PhotoCache
+from vk_api_lib.classes.rate_limiter import Priority, RateLimiter
+from vk_api_lib.classes.retry import RetryPolicy, NETWORK_ERROR_CODE, http_error_code
+
+
+PhotoSource = str | bytes | bytearray | memoryview | BinaryIO | AsyncIterable[bytes]
 
 
 class VkRequestError(Exception):
@@ -23,62 +38,209 @@ errors = {}
 
 
 class Bot:
-    def __init__(self, token: str, handler: MainHandler, logger: logging.Logger):
+    def __init__(
+            self,
+            token: str,
+            handler: MainHandler,
+            logger: logging.Logger,
+            pool_size: int = 100,
+            pool_size_per_host: int = 0,
+            keepalive_timeout: float = 30,
+            dns_cache_ttl: int = 300,
+            request_timeout: float = 30,
+            batch: bool = False,
+            batch_delay: float = 0.01,
+            batch_size: int = 25,
+            rate_limit: float | None = 20,
+            rate_burst: int = 20,
+            retry_policy: RetryPolicy | None = None,
+            photo_cache: PhotoCache | None = None,
+            upload_concurrency: int = 4,
+            upload_server_ttl: float = 600,
+            message_cache_size: int = 10000,
+            message_cache_ttl: float | None = 60,
+            edit_diffing: bool = True,
+            edit_coalesce_delay: float = EDIT_COALESCE_DELAY):
         self.token: str = token
         self.handler = handler
         self.logger = logger
+        self.pool_size = pool_size
+        self.pool_size_per_host = pool_size_per_host
+        self.keepalive_timeout = keepalive_timeout
+        self.dns_cache_ttl = dns_cache_ttl
+        self.request_timeout = request_timeout
+        self.session: aiohttp.ClientSession | None = None
+        self.batcher = ExecuteBatcher(self, batch_delay, batch_size) if batch else None
+        self.rate_limiter = RateLimiter(rate_limit, rate_burst) if rate_limit else None
+        self.retry_policy = retry_policy if retry_policy is not None else RetryPolicy()
+        self.error_counts: Counter[int] = Counter()
+        self.photo_cache = photo_cache
+        self.photo_uploads: dict[str, asyncio.Future] = {}
+        self.upload_concurrency = upload_concurrency
+        self.upload_servers = TTLCache(1024, upload_server_ttl)
+        self.upload_server_requests: dict[int, asyncio.Future] = {}
+        self.message_cache = TTLCache(message_cache_size, message_cache_ttl) if message_cache_ttl else None
+        self.edit_states = TTLCache(message_cache_size, message_cache_ttl) if edit_diffing else None
+        self.edit_coalesce_delay = edit_coalesce_delay
+        self.pending_edits: dict[tuple, PendingEdit] = {}
+        self.edit_runners: dict[tuple, asyncio.Task] = {}
+        self.edit_tasks: set[asyncio.Task] = set()
+        self.edits_in_flight: dict[tuple, asyncio.Future] = {}
+        self.skipped_edits = 0
+        self.coalesced_edits = 0
         handler.bot = self
 
-    async def request(self, path: str, data: dict) -> dict:
-        data['access_token'] = self.token
-        data['v'] = 5.131
+    async def start(self) -> None:
+        if self.session is not None and not self.session.closed:
+            return
+        connector = aiohttp.TCPConnector(
+            limit=self.pool_size,
+            limit_per_host=self.pool_size_per_host,
+            keepalive_timeout=self.keepalive_timeout,
+            ttl_dns_cache=self.dns_cache_ttl
+        )
+        self.session = aiohttp.ClientSession(
+            connector=connector,
+            timeout=aiohttp.ClientTimeout(total=self.request_timeout)
+        )
+
+    async def close(self) -> None:
+        for pending in self.pending_edits.values():
+            pending.set_exception(asyncio.CancelledError())
+        tasks = [
+            *self.edit_tasks,
+            *self.photo_uploads.values(),
+            *self.upload_server_requests.values()
+        ]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self.pending_edits.clear()
+        self.edit_runners.clear()
+
+        if self.batcher is not None:
+            await self.batcher.close()
+        if self.session is not None and not self.session.closed:
+            await self.session.close()
+        self.session = None
+
+    async def on_startup(self, app) -> None:
+        await self.start()
+
+    async def on_cleanup(self, app) -> None:
+        await self.close()
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.close()
+
+    async def get_session(self) -> aiohttp.ClientSession:
+        if self.session is None or self.session.closed:
+            await self.start()
+        return self.session
+
+    async def request(self, path: str, data: dict, priority: int = Priority.default) -> dict:
+        attempt = 0
+        while True:
+            if self.batcher is not None and path != VK_API_EXECUTE_PATH:
+                resp = await self.batcher.request(path, data, priority)
+            else:
+                resp = await self.send_request(path, data, priority)
+
+            error = resp.get('error')
+            if not error:
+                return resp
+
+            error_code = error.get('error_code')
+            self.error_counts[error_code] += 1
+            if not self.retry_policy.should_retry(error_code, attempt):
+                return resp
+
+            attempt += 1
+            delay = self.retry_policy.get_delay(attempt)
+            self.logger.warning(f'RETRY {path} error id{error_code} attempt {attempt} in {delay:.2f}s')
+            await asyncio.sleep(delay)
 
-        print(data)
+    async def send_request(self, path: str, data: dict, priority: int = Priority.default) -> dict:
+        data = {**data, 'access_token': self.token, 'v': 5.131}
 
         try:
-            async with aiohttp.ClientSession() as session:
-                resp = await session.post(
-                    url=VK_API_URL + path,
-                    data=data
-                )
+            if self.rate_limiter is not None:
+                await self.rate_limiter.acquire(priority)
+            session = await self.get_session()
+            async with session.post(
+                url=VK_API_URL + path,
+                data=data
+            ) as resp:
+                if resp.status >= 500:
+                    return {'error': {'error_code': http_error_code(resp.status), 'error_msg': resp.reason}}
                 resp = await resp.json()
         except Exception as e:
             self.logger.error(e)
-            return {}
+            return {'error': {'error_code': NETWORK_ERROR_CODE, 'error_msg': repr(e)}}
         else:
             return resp
 
     async def error_handler(self, resp: dict, args: dict):
         resp = resp['error']
         if resp['error_code'] == 909:
-            await self.send_message(args['user_id'], args['text'], args['keyboard'], args['photos'])
+            return await self.send_message(args['user_id'], args['text'], args['keyboard'], args['photos'])
         else:
             error_msg = VkRequestError.msg.format(id=resp['error_code'], msg=resp['error_msg'])
             self.logger.error(error_msg)
             raise VkRequestError(error_msg)
 
-    async def send_message(self, user_id: int, text: str, keyboard: Keyboard | dict = None,
+    def remember_message(self, message: Message) -> Message:
+        if self.message_cache is not None and message.conversation_message_id:
+            self.message_cache.set((message.user_id, message.conversation_message_id), message)
+        return message
+
+    def get_cached_message(self, peer_id: int, conversation_message_id: int) -> Message | None:
+        if self.message_cache is None:
+            return None
+        return self.message_cache.get((peer_id, conversation_message_id))
+
+    @staticmethod
+    def encode_keyboard(keyboard: Keyboard | dict | str) -> str:
+        if isinstance(keyboard, str):
+            return keyboard
+        if isinstance(keyboard, Keyboard):
+            return keyboard.json()
+        return json.dumps(keyboard, separators=(',', ':'))
+
+    async def attach_photos(self, user_id: int, photos: list[PhotoSource | Photo],
+                            priority: int = Priority.default) -> list[Photo]:
+        for photo in photos:
+            if not isinstance(photo, (str, bytes, bytearray, memoryview, Photo, io.IOBase, AsyncIterable)):
+                raise TypeError('only type <str>, <bytes>, file-like, async iterable and <Photo> supported')
+
+        semaphore = asyncio.Semaphore(self.upload_concurrency)
+
+        async def attach(photo: PhotoSource | Photo) -> Photo:
+            if type(photo) is Photo:
+                return photo
+            async with semaphore:
+                return await self.attach_photo(user_id, photo, priority)
+
+        return list(await asyncio.gather(*map(attach, photos)))
+
+    async def send_message(self, user_id: int, text: str, keyboard: Keyboard | dict | str = None,
                            photos: list[str | Photo] = None, videos: list[str | Video] = None,
-                           forward: list[Message] = None):
+                           forward: list[Message] = None, priority: int = Priority.default):
         data = {
-            'user_id': user_id,
+            'peer_ids': user_id,
             'message': text,
             'random_id': random.randint(0, 2147483647),
         }
         if keyboard:
-            data['keyboard'] = keyboard.json() if type(keyboard) == Keyboard else json.dumps(keyboard)
+            data['keyboard'] = self.encode_keyboard(keyboard)
 
         if photos:
-            attachments = []
-            for photo in photos:
-                if type(photo) is str:
-                    attachments.append(await self.attach_photo(user_id, photo))
-                elif type(photo) is Photo:
-                    attachments.append(photo)
-                else:
-                    raise TypeError('only type <str> and <Photo> supported')
+            attachments = await self.attach_photos(user_id, photos, priority)
             data['attachment'] = ','.join(map(lambda x: x.data, attachments))
-
         else:
             attachments = None
 
@@ -93,56 +255,202 @@ class Bot:
         else:
             forward = None
 
-        resp = await self.request(VK_API_SEND_MESSAGE_PATH, data)
+        resp = await self.request(VK_API_SEND_MESSAGE_PATH, data, priority)
+        if not resp.get('error') and resp['response'][0].get('error'):
+            error = resp['response'][0]['error']
+            resp = {'error': {'error_code': error.get('code'), 'error_msg': error.get('description')}}
+
         if resp.get('error'):
             await self.error_handler(
                 resp,
                 {
                     'user_id': user_id,
                     'text': text,
-                    'keyboad': keyboard,
+                    'keyboard': keyboard,
                     'photos': photos,
                     'forward': forward
                 })
         else:
-            return Message(user_id, text, resp['response'], self, keyboard, attachments)
+            sent = resp['response'][0]
+            edit_key = get_edit_key(user_id, sent.get('message_id'), sent.get('conversation_message_id'))
+            if self.edit_states is not None and edit_key is not None:
+                edit_state = self.get_edit_state(text, keyboard, attachments)
+                if edit_state is not None:
+                    self.edit_states.set(edit_key, edit_state)
+            return self.remember_message(Message(
+                user_id=user_id,
+                text=text,
+                message_id=sent.get('message_id'),
+                conversation_message_id=sent.get('conversation_message_id'),
+                bot=self,
+                keyboard=keyboard,
+                attachments=attachments
+            ))
+
+    async def send_broadcast_chunk(self, user_ids: list[int], data: dict) -> dict:
+        data = {
+            **data,
+            'peer_ids': ','.join(map(str, user_ids)),
+            'random_id': random.randint(0, 2147483647)
+        }
+        return await self.request(VK_API_SEND_MESSAGE_PATH, data, Priority.bulk)
+
+    async def broadcast(
+            self,
+            user_ids: list[int],
+            text: str,
+            keyboard: Keyboard | dict | str = None,
+            photos: list[str | Photo] = None,
+            offset: int = 0,
+            chunk_size: int = BROADCAST_CHUNK_SIZE,
+            concurrency: int = 4) -> AsyncIterator[BroadcastResult]:
+        chunk_size = min(chunk_size, BROADCAST_CHUNK_SIZE)
+        if offset >= len(user_ids):
+            return
+
+        data = {'message': text}
+        if keyboard:
+            data['keyboard'] = self.encode_keyboard(keyboard)
+        if photos:
+            attachments = await self.attach_photos(user_ids[offset], photos, Priority.bulk)
+            data['attachment'] = ','.join(map(lambda x: x.data, attachments))
+
+        pending: deque[tuple[int, asyncio.Task]] = deque()
+        try:
+            for start in range(offset, len(user_ids), chunk_size):
+                chunk = user_ids[start:start + chunk_size]
+                pending.append((start, asyncio.create_task(self.send_broadcast_chunk(chunk, data))))
+
+                while pending and (len(pending) >= concurrency or start + chunk_size >= len(user_ids)):
+                    chunk_start, task = pending.popleft()
+                    chunk = user_ids[chunk_start:chunk_start + chunk_size]
+                    for result in BroadcastResult.from_response(chunk_start, chunk, await task):
+                        yield result
+        finally:
+            for _, task in pending:
+                task.cancel()
+
+    def get_edit_state(self, text: str, keyboard: Keyboard | dict | str = None,
+                       photos: list[str | Photo] = None) -> tuple | None:
+        photos_key = get_photos_key(photos)
+        if photos_key is None:
+            return None
+        return text, self.encode_keyboard(keyboard) if keyboard else None, photos_key
 
     async def edit_message(
             self,
             user_id: int,
             message_id: int,
             text: str,
-            keyboard: Keyboard | dict = None,
+            keyboard: Keyboard | dict | str = None,
             photos: list[str | Photo] = None,
             videos: list[str | Video] = None,
-            message=None):
+            message=None,
+            priority: int = Priority.default,
+            conversation_message_id: int = None,
+            force: bool = False):
+
+        args = (user_id, message_id, text, keyboard, photos, videos, message, priority, conversation_message_id)
+        key = get_edit_key(user_id, message_id, conversation_message_id)
+        if key is None or self.edit_states is None:
+            return await self.send_edit(*args)
+
+        if not self.edit_coalesce_delay:
+            return await self.apply_edit(key, args, force)
+
+        pending = self.pending_edits.get(key)
+        if pending is not None:
+            pending.replace(args, force)
+            self.coalesced_edits += 1
+        else:
+            pending = self.pending_edits[key] = PendingEdit(args, force)
+            previous = self.edit_runners.get(key)
+            runner = self.edit_runners[key] = asyncio.create_task(self.run_edit(key, pending, previous))
+            self.edit_tasks.add(runner)
+            runner.add_done_callback(self.edit_tasks.discard)
+
+        return await asyncio.shield(pending.future)
+
+    async def run_edit(self, key: tuple, pending: PendingEdit, previous: asyncio.Task | None):
+        try:
+            if previous is not None:
+                await asyncio.wait((previous,))
+            del self.pending_edits[key]
+            pending.set_result(await self.apply_edit(key, pending.args, pending.force))
+            await asyncio.sleep(self.edit_coalesce_delay)
+        except BaseException as e:
+            if self.pending_edits.get(key) is pending:
+                del self.pending_edits[key]
+            pending.set_exception(e)
+            if isinstance(e, asyncio.CancelledError):
+                raise
+        finally:
+            if self.edit_runners.get(key) is asyncio.current_task():
+                del self.edit_runners[key]
+
+    async def apply_edit(self, key: tuple, args: tuple, force: bool):
+        done = asyncio.get_running_loop().create_future()
+        previous = self.edits_in_flight.get(key)
+        self.edits_in_flight[key] = done
+        try:
+            if previous is not None:
+                await asyncio.wait((previous,))
+
+            user_id, message_id, text, keyboard, photos, videos, message, priority, conversation_message_id = args
+            state = self.get_edit_state(text, keyboard, photos)
+            if not force and state is not None and self.edit_states.get(key) == state:
+                self.skipped_edits += 1
+                if message is not None:
+                    return message
+                return self.get_cached_message(user_id, conversation_message_id)
+
+            return await self.send_edit(*args, edit_key=key, edit_state=state)
+        finally:
+            done.set_result(None)
+            if self.edits_in_flight.get(key) is done:
+                del self.edits_in_flight[key]
+
+    async def send_edit(
+            self,
+            user_id: int,
+            message_id: int,
+            text: str,
+            keyboard: Keyboard | dict | str = None,
+            photos: list[str | Photo] = None,
+            videos: list[str | Video] = None,
+            message=None,
+            priority: int = Priority.default,
+            conversation_message_id: int = None,
+            edit_key: tuple = None,
+            edit_state: tuple = None):
 
         data = {
             'peer_id': user_id,
-            'message_id': message_id,
             'message': text,
             'random_id': random.randint(0, 2147483647),
         }
+        if message_id:
+            data['message_id'] = message_id
+        else:
+            data['conversation_message_id'] = conversation_message_id
         if keyboard:
-            data['keyboard'] = keyboard.json() if type(keyboard) == Keyboard else json.dumps(keyboard)
+            data['keyboard'] = self.encode_keyboard(keyboard)
 
         if photos:
-            attachments = []
-            for photo in photos:
-                if type(photo) is str:
-                    attachments.append(await self.attach_photo(user_id, photo))
-                elif type(photo) is Photo:
-                    attachments.append(photo)
-                else:
-                    raise TypeError('only type <str> and <Photo> supported')
-
+            attachments = await self.attach_photos(user_id, photos, priority)
             data['attachment'] = ','.join(map(lambda x: x.data, attachments))
         else:
             attachments = None
 
-        resp = await self.request(VK_API_EDIT_MESSAGE_PATH, data)
+        resp = await self.request(VK_API_EDIT_MESSAGE_PATH, data, priority)
+        if edit_key is not None:
+            if resp.get('error') or edit_state is None:
+                self.edit_states.pop(edit_key)
+            else:
+                self.edit_states.set(edit_key, edit_state)
+
         if resp.get('error'):
-            await self.error_handler(
+            return await self.error_handler(
                 resp,
                 {
                     'user_id': user_id,
@@ -159,25 +467,34 @@ class Bot:
                 message.keyboard = keyboard
                 if photos:
                     message.parse_attachments(attachments, save_old=False)
-                return message
+                return self.remember_message(message)
             else:
-                return Message(user_id, text, resp['response'], self, keyboard, attachments)
-
-    async def delete_message(self, message_id: int) -> None:
+                return self.remember_message(Message(
+                    user_id=user_id,
+                    text=text,
+                    message_id=message_id,
+                    conversation_message_id=conversation_message_id,
+                    bot=self,
+                    keyboard=keyboard,
+                    attachments=attachments
+                ))
+
+    async def delete_message(self, message_id: int, priority: int = Priority.default) -> None:
         data = {
             'message_ids': f'{message_id},',
             'delete_for_all': True
         }
-        resp = await self.request(VK_API_DELETE_MESSAGE_PATH, data)
+        resp = await self.request(VK_API_DELETE_MESSAGE_PATH, data, priority)
         if resp.get('error'):
             await self.error_handler(resp, {'message_id': message_id})
 
-    async def get_message_by_conversation_id(self, user_id: int, conversation_id: int):
+    async def get_message_by_conversation_id(self, user_id: int, conversation_id: int,
+                                             priority: int = Priority.default):
         data = {
             'conversation_message_ids': f'{conversation_id},',
             'peer_id': user_id
         }
-        resp = await self.request(VK_API_GET_MESSAGE_BY_CONSERVATION_ID_PATH, data)
+        resp = await self.request(VK_API_GET_MESSAGE_BY_CONSERVATION_ID_PATH, data, priority)
         if resp.get('error'):
             await self.error_handler(resp, {'user_id': user_id, 'conversation_id': conversation_id})
 
@@ -185,68 +502,118 @@ class Bot:
 
         return message
 
-    async def get_upload_photo_server(self, user_id: int):
+    async def get_upload_photo_server(self, user_id: int, priority: int = Priority.default):
+        upload_url = self.upload_servers.get(user_id)
+        if upload_url is not None:
+            return upload_url
+
+        request = self.upload_server_requests.get(user_id)
+        if request is None:
+            request = asyncio.ensure_future(self.fetch_upload_photo_server(user_id, priority))
+            self.upload_server_requests[user_id] = request
+            request.add_done_callback(lambda _: self.upload_server_requests.pop(user_id, None))
+        return await asyncio.shield(request)
+
+    async def fetch_upload_photo_server(self, user_id: int, priority: int = Priority.default):
         data = {
             'peer_id': user_id
         }
 
-        resp = await self.request(VK_API_GET_UPLOAD_SERVER_PHOTO_PATH, data)
+        resp = await self.request(VK_API_GET_UPLOAD_SERVER_PHOTO_PATH, data, priority)
         if resp.get('error'):
             await self.error_handler(resp, {'user_id': user_id})
 
-        return resp['response']['upload_url']
+        upload_url = resp['response']['upload_url']
+        self.upload_servers.set(user_id, upload_url)
+        return upload_url
 
-    async def upload_message_photo(self, user_id: int, photo_path: str):
+    async def upload_message_photo(self, user_id: int, photo: PhotoSource, priority: int = Priority.default):
+        file = None
         try:
             data = FormData()
-            data.add_field('photo', self.encode_photo(photo_path))
+            if type(photo) is str:
+                file = await asyncio.to_thread(open, photo, 'rb')
+                data.add_field('photo', file, filename=os.path.basename(photo))
+            else:
+                data.add_field('photo', photo, filename='photo.jpg')
 
-            async with aiohttp.ClientSession() as session:
-                resp = await session.post(
-                    url=await self.get_upload_photo_server(user_id),
-                    data=data
-                )
+            session = await self.get_session()
+            async with session.post(
+                url=await self.get_upload_photo_server(user_id, priority),
+                data=data
+            ) as resp:
                 resp = json.loads(await resp.text())
         except Exception as e:
             self.logger.error(e)
+            self.upload_servers.pop(user_id)
             return {}
         else:
+            if not resp.get('photo') or resp['photo'] == '[]':
+                self.upload_servers.pop(user_id)
             return resp
+        finally:
+            if file is not None:
+                file.close()
 
-    async def save_message_photo(self, server: int, photo: str, hash_: str):
+    async def save_message_photo(self, server: int, photo: str, hash_: str, priority: int = Priority.default):
         data = {
             'server': server,
             'photo': photo,
             'hash': hash_
         }
 
-        resp = await self.request(VK_API_SAVE_MESSAGE_PHOTO_PATH, data)
+        resp = await self.request(VK_API_SAVE_MESSAGE_PHOTO_PATH, data, priority)
         if resp.get('error'):
             await self.error_handler(resp, {'server': server, 'photo': photo, 'hash': hash_})
         return resp['response'][0]
 
-    async def attach_photo(self, user_id: int, photo_path: str) -> Photo:
-        data = await self.upload_message_photo(user_id, photo_path)
-        photo_data = await self.save_message_photo(**data)
+    async def upload_photo(self, user_id: int, photo: PhotoSource, priority: int = Priority.default,
+                           digest: str = None) -> dict:
+        position = photo.tell() if isinstance(photo, io.IOBase) and photo.seekable() else None
+        data = await self.upload_message_photo(user_id, photo, priority)
+        if not data.get('photo') or data['photo'] == '[]':
+            if isinstance(photo, (str, bytes, bytearray, memoryview)) or position is not None:
+                if position is not None:
+                    photo.seek(position)
+                data = await self.upload_message_photo(user_id, photo, priority)
+
+        if not data.get('photo') or data['photo'] == '[]':
+            error_msg = VkRequestError.msg.format(id=0, msg='photo upload failed')
+            self.logger.error(error_msg)
+            raise VkRequestError(error_msg)
+
+        photo_data = await self.save_message_photo(data['server'], data['photo'], data['hash'], priority)
+        if digest is not None:
+            await self.photo_cache.set(digest, photo_data)
+        return photo_data
+
+    async def attach_photo(self, user_id: int, photo: PhotoSource, priority: int = Priority.default) -> Photo:
+        digest = None
+        if self.photo_cache is not None:
+            digest = await self.photo_cache.get_digest(photo)
+        if digest is None:
+            return Photo.from_message_handler(await self.upload_photo(user_id, photo, priority))
+
+        photo_data = await self.photo_cache.get(digest)
+        if photo_data is None:
+            upload = self.photo_uploads.get(digest)
+            if upload is None:
+                upload = asyncio.ensure_future(self.upload_photo(user_id, photo, priority, digest))
+                self.photo_uploads[digest] = upload
+                upload.add_done_callback(lambda _: self.photo_uploads.pop(digest, None))
+            photo_data = await asyncio.shield(upload)
 
         return Photo.from_message_handler(photo_data)
 
-    async def get_user_data(self, user_id: int):
+    async def get_user_data(self, user_id: int, priority: int = Priority.default):
         data = {
             'user_id': user_id,
             'fields': 'nickname'
         }
-        resp = await self.request(VK_API_GET_USERS_PATH, data)
+        resp = await self.request(VK_API_GET_USERS_PATH, data, priority)
         if resp.get('error'):
             await self.error_handler(resp, {'user_id': user_id})
 
         user = resp['response'][0]
 
         return user
-
-    @staticmethod
-    def encode_photo(photo_path: str) -> bytes:
-        with open(photo_path, "rb") as image_file:
-            encoded = image_file.read()
-        return encoded
-
@@ -0,0 +1,54 @@
+from typing import Optional
+
+
+BROADCAST_CHUNK_SIZE = 100
+
+
+class BroadcastResult:
+    def __init__(
+            self,
+            index: int,
+            user_id: int,
+            message_id: Optional[int] = None,
+            conversation_message_id: Optional[int] = None,
+            error: Optional[dict] = None):
+        self.index = index
+        self.user_id = user_id
+        self.message_id = message_id
+        self.conversation_message_id = conversation_message_id
+        self.error = error
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+    @property
+    def checkpoint(self) -> int:
+        return self.index + 1
+
+    @classmethod
+    def from_response(cls, offset: int, user_ids: list[int], resp: dict) -> list['BroadcastResult']:
+        items = resp.get('response')
+        if type(items) is not list:
+            error = resp.get('error') or {'error_code': 0, 'error_msg': 'empty response'}
+            return [cls(offset + i, user_id, error=error) for i, user_id in enumerate(user_ids)]
+
+        items = {item.get('peer_id'): item for item in items}
+        results = []
+        for i, user_id in enumerate(user_ids):
+            item = items.get(user_id)
+            if item is None:
+                results.append(cls(offset + i, user_id, error={'error_code': 0, 'error_msg': 'no result'}))
+            elif item.get('error'):
+                error = item['error']
+                results.append(cls(offset + i, user_id, error={
+                    'error_code': error.get('code'),
+                    'error_msg': error.get('description')
+                }))
+            else:
+                results.append(cls(
+                    offset + i, user_id,
+                    message_id=item.get('message_id'),
+                    conversation_message_id=item.get('conversation_message_id')
+                ))
+        return results
@@ -0,0 +1,53 @@
+import math
+import time
+from collections import OrderedDict
+from typing import Any, Hashable
+
+
+NO_EXPIRY = math.inf
+
+
+class TTLCache:
+    def __init__(self, maxsize: int = 1024, ttl: float | None = None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.data: OrderedDict[Hashable, tuple[float | None, Any]] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self.data)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return self.get(key, self) is not self
+
+    def get(self, key: Hashable, default=None):
+        item = self.data.get(key)
+        if item is None:
+            return default
+
+        expires, value = item
+        if expires is not None and expires <= time.monotonic():
+            del self.data[key]
+            return default
+
+        self.data.move_to_end(key)
+        return value
+
+    def set(self, key: Hashable, value, ttl: float | None = None) -> None:
+        ttl = self.ttl if ttl is None else ttl
+        expires = time.monotonic() + ttl if ttl is not None and ttl != NO_EXPIRY else None
+        self.data[key] = (expires, value)
+        self.data.move_to_end(key)
+        while len(self.data) > self.maxsize:
+            self.data.popitem(last=False)
+
+    def pop(self, key: Hashable, default=None):
+        item = self.data.pop(key, None)
+        if item is None:
+            return default
+        expires, value = item
+        if expires is not None and expires <= time.monotonic():
+            return default
+        return value
+
+    def clear(self) -> None:
+        self.data.clear()
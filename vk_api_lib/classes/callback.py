@@ -1,34 +1,70 @@
-from typing import Type
+from typing import Optional, Type
 
 from loader import logger
 from vk_api_lib.classes.callback_data import CallbackData
 from vk_api_lib.classes.message import Message
+from vk_api_lib.classes.rate_limiter import Priority
 from vk_api_lib.classes.update import Update
 
 
 class Callback(Update):
-    def __init__(self, callback_data: CallbackData, peer_id: int, message: Message = None):
-        self.message = message
+    def __init__(self, callback_data: CallbackData, peer_id: int, message: Message = None,
+                 conversation_message_id: int = None, bot=None):
         self.callback_data = callback_data
         self.user_id = peer_id
+        self.conversation_message_id = conversation_message_id
+        self.bot = bot
+        self._message = message
+
+    @property
+    def message(self) -> Optional[Message]:
+        if self._message is None and self.conversation_message_id:
+            self._message = self.bot.get_cached_message(self.user_id, self.conversation_message_id)
+            if self._message is None:
+                self._message = Message(
+                    user_id=self.user_id,
+                    text=None,
+                    message_id=None,
+                    conversation_message_id=self.conversation_message_id,
+                    bot=self.bot,
+                    loader=self.fetch_message
+                )
+        return self._message
+
+    @message.setter
+    def message(self, message: Optional[Message]):
+        self._message = message
+
+    async def get_message(self) -> Optional[Message]:
+        message = self.message
+        if message is not None:
+            await message.load()
+        return message
+
+    async def fetch_message(self) -> Optional[Message]:
+        message = self.bot.get_cached_message(self.user_id, self.conversation_message_id)
+        if message is not None:
+            return message
+
+        message_resp = await self.bot.get_message_by_conversation_id(
+            self.user_id, self.conversation_message_id, Priority.interactive
+        )
+        message = Message.from_callback_handler(message_resp, self.bot)
+        if message is not None:
+            self.bot.remember_message(message)
+        return message
 
     @classmethod
-    async def parse(cls, callback: dict, callback_data_class: Type[CallbackData], bot):
+    async def parse(cls, callback: dict, callback_data_class: Type[CallbackData], bot, payload: dict = None):
         peer_id = callback.get('peer_id')
         conversation_message_id = callback.get('conversation_message_id')
-        payload = callback.get('payload').get(callback_data_class.__name__)
+        if payload is None:
+            payload = callback.get('payload').get(callback_data_class.__name__)
 
         if peer_id and (payload is not None):
             callback_data: callback_data_class = await callback_data_class.parse(payload)
-            if conversation_message_id:
-                message_resp = await bot.get_message_by_conversation_id(peer_id, conversation_message_id)
-                message = Message.from_callback_handler(message_resp, bot)
-                return cls(callback_data=callback_data, peer_id=peer_id, message=message)
-            else:
-                return cls(callback_data=callback_data, peer_id=peer_id)
+            return cls(callback_data=callback_data, peer_id=peer_id,
+                       conversation_message_id=conversation_message_id, bot=bot)
         else:
             logger.error(f'cant parse callback')
             return None
-
-
-
@@ -1,8 +1,8 @@
-import copy
+import asyncio
 
 from tortoise import Model
-from tortoise.exceptions import DoesNotExist
 
+from vk_api_lib.classes.cache import TTLCache
 from vk_api_lib.classes.filters import CallbackFilter
 
 
@@ -10,38 +10,109 @@ class NotFoundObject(Exception):
     message = 'Not found {type} with id {id}'
 
 
+object_cache = TTLCache(10000)
+
+COMPACT_KEY = '_'
+
+
 class CallbackData:
+    _fields: dict[str, type] = {}
+    _model_fields: dict[str, type[Model]] = {}
+    object_cache_ttl: float | None = None
+    tag: str | None = None
+    version: int = 1
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls.compile()
+
+    @classmethod
+    def compile(cls):
+        cls._fields = dict(cls.__dict__.get('__annotations__', {}))
+        cls._model_fields = {
+            name: annotation for name, annotation in cls._fields.items()
+            if isinstance(annotation, type) and issubclass(annotation, Model)
+        }
+
     def new(self) -> dict:
-        if hasattr(self, '__annotations__'):
-            datas = copy.deepcopy(self.__dict__)
-            for name, annotation in self.__annotations__.items():
-                if Model.__subclasscheck__(annotation):
-                    datas[name] = datas[name].id
-        else:
-            datas = {}
+        if self.tag is not None:
+            return self.new_compact()
+
+        datas = dict(self.__dict__)
+        for name in self._model_fields:
+            datas[name] = datas[name].id
 
         return {self.__class__.__name__: datas}
 
+    def new_compact(self) -> dict:
+        values = [self.tag, self.version]
+        for name in self._fields:
+            value = getattr(self, name)
+            values.append(value.id if name in self._model_fields else value)
+
+        return {COMPACT_KEY: values}
+
+    @classmethod
+    def upgrade(cls, version: int, values: list) -> list:
+        return values
+
+    @classmethod
+    def from_compact(cls, version: int, values: list) -> dict:
+        if version != cls.version:
+            values = cls.upgrade(version, values)
+        return dict(zip(cls._fields, values))
+
     @classmethod
     def filter(cls):
         return CallbackFilter(cls)
 
+    @classmethod
+    async def fetch_objects(cls, model: type[Model], ids: set[int]) -> dict[int, Model]:
+        objects = {}
+        if cls.object_cache_ttl:
+            for id_ in ids:
+                obj = object_cache.get((model, id_))
+                if obj is not None:
+                    objects[id_] = obj
+            ids = ids - objects.keys()
+
+        if ids:
+            for obj in await model.filter(id__in=list(ids)):
+                objects[obj.id] = obj
+                if cls.object_cache_ttl:
+                    object_cache.set((model, obj.id), obj, cls.object_cache_ttl)
+
+        return objects
+
     @classmethod
     async def parse(cls, callback_data: dict):
-        if hasattr(cls, '__annotations__') and callback_data:
-            datas = copy.deepcopy(cls.__annotations__)
+        if cls._fields and callback_data:
+            datas = dict(cls._fields)
+            lookups: dict[type[Model], dict[str, int]] = {}
             for key, value in callback_data.items():
-                annotation = cls.__annotations__[key]
-                if Model.__subclasscheck__(annotation):
+                annotation = cls._fields[key]
+                if key in cls._model_fields:
                     try:
-                        datas[key] = await annotation.get(id=int(value))
-                    except (DoesNotExist, ValueError):
+                        lookups.setdefault(annotation, {})[key] = int(value)
+                    except ValueError:
                         raise NotFoundObject(NotFoundObject.message.format(
                             type=annotation, id=value
                         ))
-
                 else:
                     datas[key] = annotation(value)
+
+            if lookups:
+                models = list(lookups)
+                results = await asyncio.gather(*(
+                    cls.fetch_objects(model, set(lookups[model].values())) for model in models
+                ))
+                for model, objects in zip(models, results):
+                    for key, id_ in lookups[model].items():
+                        if id_ not in objects:
+                            raise NotFoundObject(NotFoundObject.message.format(
+                                type=model, id=id_
+                            ))
+                        datas[key] = objects[id_]
         else:
             datas = {}
 
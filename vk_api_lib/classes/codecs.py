@@ -0,0 +1,100 @@
+import json
+import typing
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+
+class Codec:
+    binary = False
+
+    def encode_field(self, field: str, value) -> str | bytes:
+        raise NotImplementedError('define this function')
+
+    def decode_field(self, field: str, raw: str | bytes):
+        raise NotImplementedError('define this function')
+
+    def encode_hash(self, data: dict) -> dict:
+        return {field: self.encode_field(field, value) for field, value in data.items()}
+
+    def decode_hash(self, data: dict) -> dict:
+        return {field: self.decode_field(field, raw) for field, raw in data.items()}
+
+
+class StrCodec(Codec):
+    def encode_field(self, field: str, value) -> str:
+        return value if type(value) is str else str(value)
+
+    def decode_field(self, field: str, raw: str | bytes):
+        return raw.decode() if type(raw) is bytes else raw
+
+
+class JsonCodec(Codec):
+    def encode_field(self, field: str, value) -> str:
+        if orjson is not None:
+            return orjson.dumps(value).decode()
+        return json.dumps(value, ensure_ascii=False, separators=(',', ':'))
+
+    def decode_field(self, field: str, raw: str | bytes):
+        if raw is None:
+            return None
+        try:
+            return orjson.loads(raw) if orjson is not None else json.loads(raw)
+        except ValueError:
+            return raw.decode() if type(raw) is bytes else raw
+
+
+class MsgpackCodec(Codec):
+    binary = True
+
+    def __init__(self):
+        if msgpack is None:
+            raise ImportError('install "msgpack" to use MsgpackCodec')
+
+    def encode_field(self, field: str, value) -> bytes:
+        return msgpack.packb(value, use_bin_type=True)
+
+    def decode_field(self, field: str, raw: bytes):
+        if raw is None:
+            return None
+        return msgpack.unpackb(raw, raw=False)
+
+
+class TypedCodec(Codec):
+    scalars = (str, int, float)
+
+    def __init__(self, schema: type, fallback: Codec = None):
+        self.fields: dict[str, type] = typing.get_type_hints(schema)
+        self.fallback = fallback if fallback is not None else StrCodec()
+        self.json = JsonCodec()
+
+    def encode_field(self, field: str, value) -> str:
+        annotation = self.fields.get(field)
+        if annotation is None:
+            return self.fallback.encode_field(field, value)
+        if annotation is bool:
+            return '1' if value else '0'
+        if annotation in self.scalars:
+            return str(value)
+        return self.json.encode_field(field, value)
+
+    def decode_field(self, field: str, raw: str | bytes):
+        annotation = self.fields.get(field)
+        if annotation is None:
+            return self.fallback.decode_field(field, raw)
+        if raw is None:
+            return None
+        if type(raw) is bytes:
+            raw = raw.decode()
+        if annotation is bool:
+            return raw in ('1', 'True', 'true')
+        if annotation in self.scalars:
+            return annotation(raw)
+        return self.json.decode_field(field, raw)
@@ -0,0 +1,56 @@
+from redis import asyncio as aioredis
+
+from vk_api_lib.classes.cache import TTLCache
+
+
+class EventDeduplicator:
+    def __init__(self, maxsize: int = 10000, ttl: float = 600):
+        self.events = TTLCache(maxsize, ttl)
+        self.ttl = ttl
+        self.checked = 0
+        self.hits = 0
+
+    def seen_locally(self, event_id: str) -> bool:
+        if event_id in self.events:
+            return True
+        self.events.set(event_id, True)
+        return False
+
+    async def seen(self, event_id: str) -> bool:
+        return self.seen_locally(event_id)
+
+    async def forget(self, event_id: str) -> None:
+        self.events.pop(event_id)
+
+    async def is_duplicate(self, event_id: str) -> bool:
+        self.checked += 1
+        if await self.seen(event_id):
+            self.hits += 1
+            return True
+        return False
+
+
+class RedisEventDeduplicator(EventDeduplicator):
+    def __init__(
+            self,
+            maxsize: int = 10000,
+            ttl: float = 600,
+            prefix: str = 'vk_event_',
+            redis: aioredis.Redis | None = None):
+        super().__init__(maxsize, ttl)
+        self.prefix = prefix
+        self.redis = redis
+
+    async def init_redis(self, url: str = "redis://localhost", db: int = 1):
+        self.redis = await aioredis.from_url(url, encoding='utf-8', db=db, decode_responses=True)
+
+    async def seen(self, event_id: str) -> bool:
+        if event_id in self.events:
+            return True
+        created = await self.redis.set(self.prefix + event_id, 1, ex=int(self.ttl), nx=True)
+        self.events.set(event_id, True)
+        return not created
+
+    async def forget(self, event_id: str) -> None:
+        await super().forget(event_id)
+        await self.redis.delete(self.prefix + event_id)
@@ -0,0 +1,165 @@
+import asyncio
+import traceback
+from collections import deque
+
+from loader import logger
+
+
+class DispatcherClosed(Exception):
+    msg = 'dispatcher is not accepting events'
+
+
+class QueueDispatcher:
+    def __init__(self, handler: 'MainHandler', workers: int = 16, maxsize: int = 1000, shed: bool = False):
+        self.handler = handler
+        self.workers_count = workers
+        self.maxsize = maxsize
+        self.shed = shed
+        self.queue: asyncio.Queue | None = None
+        self.workers: list[asyncio.Task] = []
+        self.accepting = False
+        self.dropped = 0
+
+    @property
+    def queue_depth(self) -> int:
+        return self.queue.qsize() if self.queue is not None else 0
+
+    async def start(self) -> None:
+        if self.workers:
+            return
+        self.queue = asyncio.Queue(self.maxsize)
+        self.workers = [asyncio.create_task(self.worker()) for _ in range(self.workers_count)]
+        self.accepting = True
+
+    def put(self, data: dict) -> bool:
+        if not self.accepting:
+            self.dropped += 1
+            return False
+        try:
+            self.queue.put_nowait(data)
+        except asyncio.QueueFull:
+            self.dropped += 1
+            logger.warning(f'dispatcher queue is full, event {data.get("event_id")} dropped')
+            return False
+        return True
+
+    async def put_wait(self, data: dict, delay: float = 0.05) -> None:
+        while self.accepting and self.queue.full():
+            await asyncio.sleep(delay)
+        if not self.accepting:
+            raise DispatcherClosed(DispatcherClosed.msg)
+        self.queue.put_nowait(data)
+
+    async def process(self, data: dict) -> None:
+        await self.handler.process_update(data)
+
+    async def worker(self) -> None:
+        while True:
+            data = await self.queue.get()
+            try:
+                await self.process(data)
+            except Exception:
+                logger.error(f'f"EXCEPTION {traceback.format_exc()} ')
+            finally:
+                self.queue.task_done()
+
+    async def close(self, timeout: float | None = 30) -> None:
+        self.accepting = False
+        if self.queue is not None:
+            try:
+                await asyncio.wait_for(self.queue.join(), timeout)
+            except asyncio.TimeoutError:
+                logger.warning(f'dispatcher closed with {self.queue.qsize()} unprocessed events')
+
+        for worker in self.workers:
+            worker.cancel()
+        await asyncio.gather(*self.workers, return_exceptions=True)
+        self.workers = []
+
+    async def on_startup(self, app) -> None:
+        await self.start()
+
+    async def on_cleanup(self, app) -> None:
+        await self.close()
+
+
+class PeerQueueDispatcher(QueueDispatcher):
+    def __init__(self, handler: 'MainHandler', workers: int = 16, maxsize: int = 1000, shed: bool = False):
+        super().__init__(handler, workers, maxsize, shed)
+        self.peers: dict[tuple[int, int], deque[dict]] = {}
+        self.tasks: set[asyncio.Task] = set()
+        self.pending = 0
+        self.semaphore: asyncio.Semaphore | None = None
+
+    @property
+    def queue_depth(self) -> int:
+        return self.pending
+
+    @property
+    def active_peers(self) -> int:
+        return len(self.peers)
+
+    async def start(self) -> None:
+        if self.accepting:
+            return
+        self.semaphore = asyncio.Semaphore(self.workers_count)
+        self.accepting = True
+
+    def put(self, data: dict) -> bool:
+        if not self.accepting or self.pending >= self.maxsize:
+            self.dropped += 1
+            if self.accepting:
+                logger.warning(f'dispatcher queue is full, event {data.get("event_id")} dropped')
+            return False
+
+        try:
+            key = self.handler.get_update_key(data)
+        except (KeyError, TypeError):
+            key = None
+
+        self.pending += 1
+        queue = self.peers.get(key)
+        if queue is not None:
+            queue.append(data)
+            return True
+
+        self.peers[key] = deque((data,))
+        task = asyncio.create_task(self.run_peer(key))
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+        return True
+
+    async def put_wait(self, data: dict, delay: float = 0.05) -> None:
+        while self.accepting and self.pending >= self.maxsize:
+            await asyncio.sleep(delay)
+        if not self.accepting:
+            raise DispatcherClosed(DispatcherClosed.msg)
+        self.put(data)
+
+    async def run_peer(self, key: tuple[int, int]) -> None:
+        queue = self.peers[key]
+        try:
+            while queue:
+                data = queue.popleft()
+                try:
+                    async with self.semaphore:
+                        await self.process(data)
+                except Exception:
+                    logger.error(f'f"EXCEPTION {traceback.format_exc()} ')
+                finally:
+                    self.pending -= 1
+        finally:
+            self.pending -= len(queue)
+            del self.peers[key]
+
+    async def close(self, timeout: float | None = 30) -> None:
+        self.accepting = False
+        if not self.tasks:
+            return
+
+        done, pending = await asyncio.wait(set(self.tasks), timeout=timeout)
+        if pending:
+            logger.warning(f'dispatcher closed with {self.pending} unprocessed events')
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
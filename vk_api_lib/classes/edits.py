@@ -0,0 +1,50 @@
+import asyncio
+from typing import Optional
+
+from vk_api_lib.classes.attachments import Photo
+
+
+EDIT_COALESCE_DELAY = 0.05
+
+
+def get_edit_key(user_id: int, message_id: Optional[int], conversation_message_id: Optional[int]) -> Optional[tuple]:
+    if conversation_message_id:
+        return user_id, 'c', conversation_message_id
+    if message_id:
+        return user_id, 'm', message_id
+    return None
+
+
+def get_photos_key(photos: Optional[list]) -> Optional[tuple]:
+    key = []
+    for photo in photos or ():
+        if isinstance(photo, Photo):
+            key.append(photo.data)
+        elif isinstance(photo, str):
+            key.append(photo)
+        else:
+            return None
+    return tuple(key)
+
+
+class PendingEdit:
+    def __init__(self, args: tuple, force: bool):
+        self.args = args
+        self.force = force
+        self.future: asyncio.Future = asyncio.get_running_loop().create_future()
+
+    def replace(self, args: tuple, force: bool):
+        self.args = args
+        self.force = self.force or force
+
+    def set_result(self, result):
+        if not self.future.done():
+            self.future.set_result(result)
+
+    def set_exception(self, exc: BaseException):
+        if self.future.done():
+            return
+        if isinstance(exc, asyncio.CancelledError):
+            self.future.cancel()
+        else:
+            self.future.set_exception(exc)
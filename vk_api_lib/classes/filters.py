@@ -28,6 +28,20 @@ class Filter:
         return NotFilter(self)
 
 
+async def check_filter(filter_: Filter, update: Update, results: dict[int, bool] = None, **kwargs) -> bool:
+    if results is not None and id(filter_) in results:
+        return results[id(filter_)]
+
+    try:
+        filter_check = filter_.check(update, **kwargs)
+    except UseAsyncCheck:
+        filter_check = await filter_.async_check(update, **kwargs)
+
+    if results is not None:
+        results[id(filter_)] = filter_check
+    return filter_check
+
+
 class NotFilter(Filter):
     def __init__(self, *filters):
         self.filters = filters
@@ -8,25 +8,50 @@ from loader import logger
 from vk_api_lib.classes.boardpost import BoardPost
 from vk_api_lib.classes.FSM import FSM, FSMContext
 from vk_api_lib.classes.callback import Callback
-from vk_api_lib.classes.callback_data import CallbackData
-from vk_api_lib.classes.filters import Filter, UseAsyncCheck
+from vk_api_lib.classes.callback_data import CallbackData, COMPACT_KEY
+from vk_api_lib.classes.dedup import EventDeduplicator
+from vk_api_lib.classes.filters import Filter, check_filter
 from vk_api_lib.classes.message import Message
+from vk_api_lib.classes.router import Router
 from vk_api_lib.classes.update import Update
 
 
 class MainHandler:
-    def __init__(self, fsm: FSM, filters: list[Filter]):
+    def __init__(self, fsm: FSM, filters: list[Filter], deduplicator: EventDeduplicator = None,
+                 fsm_buffered: bool = False):
         self.message_handlers: list[MessageHandler] = []
         self.callback_handlers: list[CallbackHandler] = []
         self.board_handlers: list[BoardHandler] = []
+        self.message_router = Router(self.message_handlers)
+        self.callback_router = Router(self.callback_handlers)
+        self.board_router = Router(self.board_handlers)
         self.bot = None
         self.fsm = fsm
         self.callback_datas = {}
+        self.callback_tags = {}
         self.filters = filters
+        self.deduplicator = deduplicator
+        self.fsm_buffered = fsm_buffered
 
     def register_callback_data(self):
         for cb in CallbackData.__subclasses__():
             self.callback_datas[cb.__name__] = cb
+            if cb.tag is None:
+                continue
+            if self.callback_tags.get(cb.tag, cb) is not cb:
+                raise ValueError(f'callback data tag "{cb.tag}" is used by '
+                                 f'{self.callback_tags[cb.tag].__name__} and {cb.__name__}')
+            self.callback_tags[cb.tag] = cb
+
+    def get_callback_data(self, payload: dict) -> tuple[type[CallbackData], dict]:
+        compact = payload.get(COMPACT_KEY)
+        if compact is not None:
+            tag, version, *values = compact
+            callback_data_class = self.callback_tags[tag]
+            return callback_data_class, callback_data_class.from_compact(version, values)
+
+        name = next(iter(payload))
+        return self.callback_datas[name], payload[name]
 
     def board_post_handler(self, *filters: Filter):
 
@@ -88,7 +113,8 @@ class MainHandler:
 
         return wrapper_1
 
-    def get_context(self, data: dict) -> FSMContext:
+    @staticmethod
+    def get_key(data: dict) -> tuple[int, int]:
         message = data.get('message')
 
         if message:
@@ -98,66 +124,126 @@ class MainHandler:
             user_id = data['user_id']
             peer_id = data['peer_id']
 
-        return self.fsm.get_context(peer_id, user_id)
+        return peer_id, user_id
+
+    def get_update_key(self, update: dict) -> tuple[int, int]:
+        if update['type'] == 'board_post_new':
+            return update['object']['from_id'], update['object']['from_id']
+        return self.get_key(update['object'])
+
+    def get_context(self, data: dict) -> FSMContext:
+        peer_id, user_id = self.get_key(data)
+        return self.fsm.get_context(peer_id, user_id, self.fsm_buffered)
+
+    async def check_filters(self, update: Update, fsm: FSMContext, results: dict[int, bool]) -> bool:
+        for filter_ in self.filters:
+            if not await check_filter(filter_, update, results, fsm=fsm):
+                return False
+        return True
 
     async def check_message_handlers(self, message: dict) -> bool:
         fsm_context = self.get_context(message)
         message = Message.from_message_handler(message, self.bot)
 
-        for handler in self.message_handlers:
+        results = {}
+        if not await self.check_filters(message, fsm_context, results):
+            return False
+
+        for handler in await self.message_router.get_handlers(message, fsm_context):
             handler: MessageHandler
 
-            if await handler.check(update=message, fsm=fsm_context, filters=self.filters):
-                await handler.run_func(message=message, fsm=fsm_context)
+            if await handler.check(update=message, fsm=fsm_context, results=results):
+                try:
+                    await handler.run_func(message=message, fsm=fsm_context)
+                finally:
+                    await fsm_context.flush()
                 return True
         return False
 
     async def check_callback_handlers(self, callback: dict) -> bool:
         fsm_context = self.get_context(callback)
-        callback_data_class = self.callback_datas[tuple(callback['payload'].keys())[0]]
+        callback_data_class, payload = self.get_callback_data(callback['payload'])
         callback: Callback = await Callback.parse(
-            callback, callback_data_class, self.bot
+            callback, callback_data_class, self.bot, payload
         )
-        for handler in self.callback_handlers:
+
+        results = {}
+        if not await self.check_filters(callback, fsm_context, results):
+            return False
+
+        for handler in await self.callback_router.get_handlers(callback, fsm_context):
             handler: CallbackHandler
 
-            if await handler.check(update=callback, fsm=fsm_context, filters=self.filters):
+            if await handler.check(update=callback, fsm=fsm_context, results=results):
                 if not callback:
                     return False
-                await handler.run_func(callback=callback, fsm=fsm_context)
+                try:
+                    await handler.run_func(callback=callback, fsm=fsm_context)
+                finally:
+                    await fsm_context.flush()
                 return True
         return False
 
     async def check_board_handlers(self, update: dict) -> bool:
-        fsm_context = self.fsm.get_context(update['from_id'], update['from_id'])
+        fsm_context = self.fsm.get_context(update['from_id'], update['from_id'], self.fsm_buffered)
         post: BoardPost = BoardPost.from_update(update)
-        for handler in self.board_handlers:
+
+        results = {}
+        if not await self.check_filters(post, fsm_context, results):
+            return False
+
+        for handler in await self.board_router.get_handlers(post, fsm_context):
             handler: BoardHandler
-            if await handler.check(update=post, fsm=fsm_context, filters=self.filters):
-                await handler.run_func(post=post, fsm=fsm_context)
+            if await handler.check(update=post, fsm=fsm_context, results=results):
+                try:
+                    await handler.run_func(post=post, fsm=fsm_context)
+                finally:
+                    await fsm_context.flush()
                 return True
         return False
 
-    def get_aiohttp_handler(self):
+    async def is_duplicate(self, data: dict) -> bool:
+        event_id = data.get('event_id')
+        if self.deduplicator is None or not event_id:
+            return False
+        if await self.deduplicator.is_duplicate(event_id):
+            logger.warning(f'duplicate event {event_id} skipped')
+            return True
+        return False
+
+    async def forget_event(self, data: dict) -> None:
+        event_id = data.get('event_id')
+        if self.deduplicator is not None and event_id:
+            await self.deduplicator.forget(event_id)
+
+    async def process_update(self, data: dict) -> None:
+        try:
+            if data['type'] == 'message_new':
+                await self.check_message_handlers(data['object'])
+            elif data['type'] == 'message_event':
+                await self.check_callback_handlers(data['object'])
+            elif data['type'] == 'board_post_new':
+                await self.check_board_handlers(data['object'])
+        except Exception as e:
+            logger.error(f'f"EXCEPTION {traceback.format_exc()} ')
+
+    def get_aiohttp_handler(self, dispatcher: 'QueueDispatcher' = None):
         async def handler(req: web.Request) -> web.Response:
             data = await req.json()
             # print(data)
             logger.warning(data)
             if data['secret'] != VK_SECRET:
                 return web.HTTPNotFound()
+            elif await self.is_duplicate(data):
+                return web.Response(text='ok')
+            elif dispatcher is not None:
+                if not dispatcher.put(data) and not dispatcher.shed:
+                    await self.forget_event(data)
+                    return web.HTTPServiceUnavailable()
+                return web.Response(text='ok')
             else:
-                try:
-                    if data['type'] == 'message_new':
-                        await self.check_message_handlers(data['object'])
-                    elif data['type'] == 'message_event':
-                        await self.check_callback_handlers(data['object'])
-                    elif data['type'] == 'board_post_new':
-                        await self.check_board_handlers(data['object'])
-                except Exception as e:
-                    logger.error(f'f"EXCEPTION {traceback.format_exc()} ')
-
-                finally:
-                    return web.Response(text='ok')
+                await self.process_update(data)
+                return web.Response(text='ok')
 
         return handler
 
@@ -167,21 +253,9 @@ class SuperHandler:
         self.func = func
         self.filters = filters
 
-    async def check(self, update: Update, filters: list[Filter], **kwargs):
-        for filter_ in filters:
-            try:
-                filter_check = filter_.check(update, **kwargs)
-            except UseAsyncCheck:
-                filter_check = await filter_.async_check(update, **kwargs)
-            if not filter_check:
-                return False
-
-        for filter_ in self.filters:
-            try:
-                filter_check = filter_.check(update, **kwargs)
-            except UseAsyncCheck:
-                filter_check = await filter_.async_check(update, **kwargs)
-            if not filter_check:
+    async def check(self, update: Update, filters: list[Filter] = (), results: dict[int, bool] = None, **kwargs):
+        for filter_ in (*filters, *self.filters):
+            if not await check_filter(filter_, update, results, **kwargs):
                 return False
 
         return True
@@ -1,8 +1,11 @@
+import asyncio
 import json
+import re
 
 from tortoise import Model
 from tortoise.queryset import QuerySet
 
+from vk_api_lib.classes.cache import TTLCache
 from vk_api_lib.classes.callback_data import CallbackData, EmptyCallback
 
 
@@ -10,6 +13,9 @@ class EndList(Exception):
     pass
 
 
+count_cache = TTLCache(1024)
+
+
 class Colors:
     primary = 'primary'
     negative = 'negative'
@@ -17,23 +23,46 @@ class Colors:
     secondary = 'secondary'
 
 
+SLOT_MARK = '$slot:'
+SLOT_PATTERN = re.compile(r'"\$slot:(\w+)"')
+
+
+class Slot:
+    def __init__(self, name: str):
+        self.name = name
+
+    def new(self) -> str:
+        return f'{SLOT_MARK}{self.name}'
+
+
 class Button:
     colors = Colors
 
-    def __init__(self, action: str, color: str = None, label: str = None, payload: CallbackData = None,
+    def __init__(self, action: str, color: str = None, label: str = None, payload: CallbackData | Slot = None,
                  link: str = None):
-        data = {'type': action}
-        if label:
-            data['label'] = label
-        if payload:
-            data['payload'] = payload.new()
-        if link:
-            data['link'] = link
-
-        self.json = {'action': data}
-
-        if color:
-            self.json['color'] = color
+        self.action = action
+        self.color = color
+        self.label = label
+        self.payload = payload
+        self.link = link
+        self._json = None
+
+    @property
+    def json(self) -> dict:
+        if self._json is None:
+            data = {'type': self.action}
+            if self.label:
+                data['label'] = self.label
+            if self.payload:
+                data['payload'] = self.payload.new()
+            if self.link:
+                data['link'] = self.link
+
+            self._json = {'action': data}
+
+            if self.color:
+                self._json['color'] = self.color
+        return self._json
 
     @classmethod
     def text(cls, text: str, payload: CallbackData = None, color: str = None):
@@ -53,20 +82,63 @@ class Button:
 
 
 class Keyboard:
-    def __init__(self, keyboard: list[list[Button]], inline: bool = False, one_time: bool = False):
+    def __init__(self, keyboard: list[list[Button]], inline: bool = False, one_time: bool = False,
+                 frozen: bool = False):
         self.keyboard: list[list[Button]] = keyboard
         self.inline = inline
         self.one_time = one_time
-
-    def json(self):
-        result = {'buttons': []}
-        for i, row in enumerate(self.keyboard):
-            result['buttons'].append([])
-            for j, button in enumerate(row):
-                result['buttons'][i].append(button.json)
-        result['inline'] = self.inline
-        result['one_time'] = self.one_time
-        return json.dumps(result)
+        self.frozen = False
+        self.encoded = None
+        if frozen:
+            self.freeze()
+
+    def freeze(self) -> 'Keyboard':
+        self.keyboard = tuple(tuple(row) for row in self.keyboard)
+        self.frozen = True
+        return self
+
+    def to_dict(self) -> dict:
+        return {
+            'buttons': [[button.json for button in row] for row in self.keyboard],
+            'inline': self.inline,
+            'one_time': self.one_time
+        }
+
+    def json(self) -> str:
+        if self.encoded is not None:
+            return self.encoded
+
+        encoded = json.dumps(self.to_dict(), separators=(',', ':'))
+        if self.frozen:
+            self.encoded = encoded
+        return encoded
+
+
+class KeyboardTemplate:
+    def __init__(self, keyboard: Keyboard):
+        encoded = keyboard.json()
+        self.parts: list[str] = []
+        self.slots: list[str] = []
+
+        start = 0
+        for match in SLOT_PATTERN.finditer(encoded):
+            self.parts.append(encoded[start:match.start()])
+            self.slots.append(match.group(1))
+            start = match.end()
+        self.parts.append(encoded[start:])
+
+    def render(self, **payloads: CallbackData | dict) -> str:
+        result = [self.parts[0]]
+        for slot, part in zip(self.slots, self.parts[1:]):
+            try:
+                payload = payloads[slot]
+            except KeyError:
+                raise KeyError(f'no payload for keyboard slot "{slot}"')
+            if isinstance(payload, CallbackData):
+                payload = payload.new()
+            result.append(json.dumps(payload, separators=(',', ':')))
+            result.append(part)
+        return ''.join(result)
 
 
 class KeyboardFactory:
@@ -87,29 +159,71 @@ class ObjectsGridCallbackKeyboard(KeyboardFactory):
     previous_btn_color: str = 'primary'
     next_btn_color: str = 'primary'
     page_btn_color: str = 'primary'
+    count_cache_ttl: float | None = 10
+    select_related: tuple[str, ...] = ()
+    prefetch_related: tuple[str, ...] = ()
+    keyset: bool = False
+    keyset_field: str = 'id'
 
-    def __init__(self, page: int, **kwargs):
+    def __init__(self, page: int, cursor: int = None, **kwargs):
         self.current_object_ = None
         self.count = None
         self.page = page
+        self.cursor = cursor
         self.kwargs = kwargs
         self.objects = None
-        pass
 
     def get_queryset(self) -> QuerySet:
         return self.model.all()
 
+    def get_count_key(self) -> str:
+        return f'{self.__class__.__module__}.{self.__class__.__qualname__}:{sorted(self.kwargs.items())!r}'
+
+    async def get_count(self) -> int:
+        if not self.count_cache_ttl:
+            return await self.get_queryset().count()
+
+        key = self.get_count_key()
+        count = count_cache.get(key)
+        if count is None:
+            count = await self.get_queryset().count()
+            count_cache.set(key, count, self.count_cache_ttl)
+        return count
+
+    async def get_objects(self, objects_on_page: int) -> list[Model]:
+        queryset = self.get_queryset()
+        if self.select_related:
+            queryset = queryset.select_related(*self.select_related)
+        if self.prefetch_related:
+            queryset = queryset.prefetch_related(*self.prefetch_related)
+
+        if not self.keyset:
+            return await queryset.offset(objects_on_page * self.page).limit(objects_on_page)
+
+        field = self.keyset_field
+        if not self.cursor:
+            return await queryset.order_by(field).limit(objects_on_page)
+        if self.cursor > 0:
+            return await queryset.filter(**{f'{field}__gt': self.cursor}).order_by(field).limit(objects_on_page)
+
+        objects = await queryset.filter(**{f'{field}__lt': -self.cursor}).order_by(f'-{field}').limit(objects_on_page)
+        return list(reversed(objects))
+
     def get_object_button(self, data_object: Model) -> Button:
         raise NotImplementedError('define this function')
 
     def get_back_button(self) -> Button:
         raise NotImplementedError('define this function')
 
-    def get_list_callback_data(self, page: int) -> CallbackData:
+    def get_list_callback_data(self, page: int, cursor: int = None) -> CallbackData:
         raise NotImplementedError('define this function')
 
-    def get_list_button(self, text: str, color: str, page: int):
-        return Button.callback(text, payload=self.get_list_callback_data(page), color=color)
+    def get_list_button(self, text: str, color: str, page: int, cursor: int = None):
+        if self.keyset:
+            payload = self.get_list_callback_data(page, cursor)
+        else:
+            payload = self.get_list_callback_data(page)
+        return Button.callback(text, payload=payload, color=color)
 
     async def create_without_grid(self) -> tuple[Keyboard, list[Model]]:
         keyboard = await self.create(without_grid=True)
@@ -121,18 +235,15 @@ class ObjectsGridCallbackKeyboard(KeyboardFactory):
     async def create(self, without_grid: bool = False) -> Keyboard:
         try:
             objects_on_page = self.cols * self.rows
-            offset = objects_on_page * self.page
-            limit = offset + objects_on_page
 
-            count = await self.model.all().count()
+            objects, count = await asyncio.gather(
+                self.get_objects(objects_on_page), self.get_count()
+            )
             pages = count // objects_on_page
             if (count % objects_on_page) != 0:
                 pages += 1
             self.count = pages
 
-            objects = await self.get_queryset().offset(offset).limit(limit)
-            print(len(objects))
-            print(objects_on_page)
             if without_grid:
                 self.objects = objects
             if not objects:
@@ -157,10 +268,15 @@ class ObjectsGridCallbackKeyboard(KeyboardFactory):
                 if not keyboard[-1]:
                     keyboard.pop(-1)
 
+        previous_cursor = next_cursor = None
+        if self.keyset:
+            previous_cursor = -getattr(objects[0], self.keyset_field)
+            next_cursor = getattr(objects[-1], self.keyset_field)
+
         keyboard.append(
             [
-                self.get_list_button(self.previous_btn_text, self.previous_btn_color, self.page-1),
-                self.get_list_button(self.next_btn_text, self.next_btn_color, self.page+1)
+                self.get_list_button(self.previous_btn_text, self.previous_btn_color, self.page-1, previous_cursor),
+                self.get_list_button(self.next_btn_text, self.next_btn_color, self.page+1, next_cursor)
             ]
         )
         if self.display_page_button:
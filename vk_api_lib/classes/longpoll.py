@@ -0,0 +1,132 @@
+import asyncio
+import traceback
+
+import aiohttp
+
+from loader import logger
+from vk_api_lib.classes.dispatcher import DispatcherClosed
+from vk_api_lib.classes.rate_limiter import Priority
+from vk_api_lib.classes.urls import VK_API_GET_LONG_POLL_SERVER_PATH
+
+
+class LongPoll:
+    def __init__(self, bot, group_id: int, wait: int = 25, dispatcher: 'QueueDispatcher' = None,
+                 max_tasks: int = 100):
+        self.bot = bot
+        self.handler = bot.handler
+        self.group_id = group_id
+        self.wait = wait
+        self.dispatcher = dispatcher
+        self.max_tasks = max_tasks
+        self.server: str | None = None
+        self.key: str | None = None
+        self.ts: str | None = None
+        self.running = False
+        self.runner: asyncio.Task | None = None
+        self.tasks: set[asyncio.Task] = set()
+        self.semaphore: asyncio.Semaphore | None = None
+
+    async def get_server(self) -> None:
+        data = {'group_id': self.group_id}
+        resp = await self.bot.request(VK_API_GET_LONG_POLL_SERVER_PATH, data, Priority.interactive)
+        if resp.get('error'):
+            await self.bot.error_handler(resp, data)
+
+        server = resp['response']
+        self.server = server['server']
+        self.key = server['key']
+        if self.ts is None:
+            self.ts = server['ts']
+
+    async def check(self) -> dict:
+        session = await self.bot.get_session()
+        params = {'act': 'a_check', 'key': self.key, 'ts': self.ts, 'wait': self.wait}
+        async with session.get(
+            self.server,
+            params=params,
+            timeout=aiohttp.ClientTimeout(total=self.wait + 10)
+        ) as resp:
+            return await resp.json(content_type=None)
+
+    async def process(self, update: dict) -> None:
+        try:
+            await self.handler.process_update(update)
+        finally:
+            self.semaphore.release()
+
+    async def dispatch(self, update: dict) -> None:
+        if self.dispatcher is not None:
+            await self.dispatcher.put_wait(update)
+            return
+
+        await self.semaphore.acquire()
+        task = asyncio.create_task(self.process(update))
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+
+    async def run(self) -> None:
+        self.running = True
+        self.semaphore = asyncio.Semaphore(self.max_tasks)
+        self.key = None
+
+        while self.running:
+            if self.key is None:
+                try:
+                    await self.get_server()
+                except asyncio.CancelledError:
+                    raise
+                except Exception:
+                    logger.error(f'f"EXCEPTION {traceback.format_exc()} - - - long poll server"')
+                    await asyncio.sleep(1)
+                    continue
+
+            try:
+                resp = await self.check()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.error(f'f"EXCEPTION {traceback.format_exc()} - - - long poll check"')
+                await asyncio.sleep(1)
+                continue
+
+            failed = resp.get('failed')
+            if failed == 1:
+                self.ts = resp['ts']
+                continue
+            elif failed == 2:
+                self.key = None
+                continue
+            elif failed == 3:
+                self.key = self.ts = None
+                continue
+
+            try:
+                for update in resp.get('updates', ()):
+                    await self.dispatch(update)
+            except DispatcherClosed:
+                logger.error(f'long poll stopped: {DispatcherClosed.msg}')
+                self.running = False
+                return
+            self.ts = resp.get('ts', self.ts)
+
+    async def start(self) -> None:
+        if self.runner is None or self.runner.done():
+            self.runner = asyncio.create_task(self.run())
+
+    async def close(self, timeout: float | None = 30) -> None:
+        self.running = False
+        if self.runner is not None:
+            self.runner.cancel()
+            await asyncio.gather(self.runner, return_exceptions=True)
+            self.runner = None
+
+        if self.tasks:
+            done, pending = await asyncio.wait(set(self.tasks), timeout=timeout)
+            for task in pending:
+                task.cancel()
+
+    async def on_startup(self, app) -> None:
+        await self.start()
+
+    async def on_cleanup(self, app) -> None:
+        await self.close()
@@ -1,9 +1,11 @@
+import asyncio
 import copy
-from typing import Optional
+from typing import Awaitable, Callable, Optional
 
 from loader import logger
 from vk_api_lib.classes.attachments import Photo, Video, Market
 from vk_api_lib.classes.keyboard import Keyboard
+from vk_api_lib.classes.rate_limiter import Priority
 from vk_api_lib.classes.update import Update
 
 
@@ -17,12 +19,13 @@ class Message(Update):
             bot,
             ref: Optional[str] = None,
             ref_source: Optional[str] = None,
-            keyboard: Optional[Keyboard | dict] = None,
+            keyboard: Optional[Keyboard | dict | str] = None,
             photos: Optional[list[Photo]] = None,
             videos: Optional[list[Video]] = None,
             markets: Optional[list[Market]] = None,
             attachments: Optional[list[Video | Photo]] = None,
             payload: Optional[str] = None,
+            loader: Optional[Callable[[], Awaitable[Optional['Message']]]] = None,
             **kwargs
     ):
 
@@ -38,6 +41,8 @@ class Message(Update):
         self.videos = videos
         self.markets = markets
         self.payload = payload
+        self.loader = loader
+        self.load_task: Optional[asyncio.Future] = None
 
         if attachments:
             self.parse_attachments(attachments, save_old=True)
@@ -60,17 +65,46 @@ class Message(Update):
         else:
             self.photos = photos_
 
-    async def answer(self, text: str, keyboard: Keyboard | dict = None, photos: list[str] = None,
+    @property
+    def loaded(self) -> bool:
+        return self.loader is None
+
+    async def load(self) -> 'Message':
+        if self.loader is None:
+            return self
+
+        if self.load_task is None:
+            self.load_task = asyncio.ensure_future(self.loader())
+        loaded = await asyncio.shield(self.load_task)
+
+        if self.loader is not None:
+            self.loader = None
+            if loaded is not None and loaded is not self:
+                self.text = loaded.text
+                self.id = loaded.id
+                self.keyboard = loaded.keyboard
+                self.photos = loaded.photos
+                self.videos = loaded.videos
+                self.markets = loaded.markets
+                self.payload = loaded.payload
+        return self
+
+    async def answer(self, text: str, keyboard: Keyboard | dict | str = None, photos: list[str] = None,
                      videos: list[str | Video] = None):
         return await self.bot.send_message(
-            self.user_id, text, keyboard, photos, videos
+            self.user_id, text, keyboard, photos, videos, priority=Priority.interactive
         )
 
     async def delete(self) -> None:
-        await self.bot.delete_message(self.id)
+        if not self.id:
+            await self.load()
+        await self.bot.delete_message(self.id, Priority.interactive)
+
+    async def edit(self, text: str = None, keyboard: Keyboard | dict | str = None, photos: list[str] = None,
+                   videos: list[str | Video] = None, force: bool = False) -> None:
+        if not text or keyboard is None:
+            await self.load()
 
-    async def edit(self, text: str = None, keyboard: Keyboard | dict = None, photos: list[str] = None,
-                   videos: list[str | Video] = None) -> None:
         if not text:
             text = self.text
 
@@ -84,11 +118,14 @@ class Message(Update):
             videos = self.videos
 
         await self.bot.edit_message(
-            self.user_id, self.id, text, keyboard, photos, videos, self
+            self.user_id, self.id, text, keyboard, photos, videos, self, Priority.interactive,
+            self.conversation_message_id, force
         )
 
-    async def forward(self, user_id: int, text: str = None, keyboard: Keyboard | dict = None, photos: list[str] = None,
+    async def forward(self, user_id: int, text: str = None, keyboard: Keyboard | dict | str = None, photos: list[str] = None,
                       videos: list[str | Video] = None) -> None:
+        if not self.id:
+            await self.load()
         await self.bot.send_message(
             user_id, text, keyboard, photos, videos, [self]
         )
@@ -0,0 +1,76 @@
+import asyncio
+import hashlib
+import json
+import os
+
+from redis import asyncio as aioredis
+
+from vk_api_lib.classes.cache import TTLCache
+
+
+class PhotoCache:
+    read_chunk_size = 1 << 16
+
+    def __init__(
+            self,
+            maxsize: int = 1024,
+            prefix: str = 'vk_photo_',
+            redis_ttl: int | None = None,
+            redis: aioredis.Redis | None = None):
+        self.photos = TTLCache(maxsize)
+        self.paths = TTLCache(maxsize)
+        self.prefix = prefix
+        self.redis_ttl = redis_ttl
+        self.redis = redis
+        self.hits = 0
+        self.misses = 0
+
+    async def init_redis(self, url: str = "redis://localhost", db: int = 1):
+        self.redis = await aioredis.from_url(url, encoding='utf-8', db=db, decode_responses=True)
+
+    @classmethod
+    def hash_file(cls, path: str) -> str:
+        digest = hashlib.sha256()
+        with open(path, 'rb') as file:
+            for chunk in iter(lambda: file.read(cls.read_chunk_size), b''):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    async def get_path_digest(self, path: str) -> str:
+        stat = await asyncio.to_thread(os.stat, path)
+        signature = (stat.st_mtime_ns, stat.st_size)
+
+        cached = self.paths.get(path)
+        if cached is not None and cached[0] == signature:
+            return cached[1]
+
+        digest = await asyncio.to_thread(self.hash_file, path)
+        self.paths.set(path, (signature, digest))
+        return digest
+
+    async def get_digest(self, photo) -> str | None:
+        if type(photo) is str:
+            return await self.get_path_digest(photo)
+        if type(photo) in (bytes, bytearray, memoryview):
+            return await asyncio.to_thread(lambda: hashlib.sha256(photo).hexdigest())
+        return None
+
+    async def get(self, digest: str) -> dict | None:
+        photo = self.photos.get(digest)
+        if photo is None and self.redis is not None:
+            raw = await self.redis.get(self.prefix + digest)
+            if raw is not None:
+                photo = json.loads(raw)
+                self.photos.set(digest, photo)
+
+        if photo is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return photo
+
+    async def set(self, digest: str, photo: dict) -> None:
+        photo = {key: value for key, value in photo.items() if key != 'sizes'}
+        self.photos.set(digest, photo)
+        if self.redis is not None:
+            await self.redis.set(self.prefix + digest, json.dumps(photo), ex=self.redis_ttl)
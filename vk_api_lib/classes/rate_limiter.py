@@ -0,0 +1,105 @@
+import asyncio
+import time
+from collections import deque
+
+
+class Priority:
+    interactive = 0
+    default = 1
+    bulk = 2
+
+
+class LaneStats:
+    def __init__(self):
+        self.acquired = 0
+        self.wait_time = 0.0
+        self.max_wait_time = 0.0
+
+    def add(self, wait_time: float) -> None:
+        self.acquired += 1
+        self.wait_time += wait_time
+        if wait_time > self.max_wait_time:
+            self.max_wait_time = wait_time
+
+    @property
+    def avg_wait_time(self) -> float:
+        return self.wait_time / self.acquired if self.acquired else 0.0
+
+
+class RateLimiter:
+    def __init__(self, rate: float = 20, burst: int = 20):
+        self.rate = rate
+        self.burst = burst
+        self.tokens: float = burst
+        self.updated = time.monotonic()
+        self.lanes: dict[int, deque[tuple[asyncio.Future, float]]] = {}
+        self.stats: dict[int, LaneStats] = {}
+        self.drain_task: asyncio.Task | None = None
+
+    @property
+    def queue_depth(self) -> int:
+        return sum(len(lane) for lane in self.lanes.values())
+
+    def get_stats(self) -> dict:
+        return {
+            priority: {
+                'queue_depth': len(self.lanes.get(priority, ())),
+                'acquired': stats.acquired,
+                'avg_wait_time': stats.avg_wait_time,
+                'max_wait_time': stats.max_wait_time
+            }
+            for priority, stats in self.stats.items()
+        }
+
+    def refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def record(self, priority: int, wait_time: float) -> None:
+        stats = self.stats.get(priority)
+        if stats is None:
+            stats = self.stats[priority] = LaneStats()
+        stats.add(wait_time)
+
+    async def acquire(self, priority: int = Priority.default) -> None:
+        self.refill()
+        if self.tokens >= 1 and not self.queue_depth:
+            self.tokens -= 1
+            self.record(priority, 0.0)
+            return
+
+        future = asyncio.get_running_loop().create_future()
+        lane = self.lanes.get(priority)
+        if lane is None:
+            lane = self.lanes[priority] = deque()
+        lane.append((future, time.monotonic()))
+
+        if self.drain_task is None or self.drain_task.done():
+            self.drain_task = asyncio.create_task(self.drain())
+
+        await future
+
+    def next_waiter(self) -> tuple[int, asyncio.Future, float] | None:
+        for priority in sorted(self.lanes):
+            lane = self.lanes[priority]
+            while lane:
+                future, started = lane.popleft()
+                if not future.done():
+                    return priority, future, started
+        return None
+
+    async def drain(self) -> None:
+        while self.queue_depth:
+            self.refill()
+            if self.tokens < 1:
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+                continue
+
+            waiter = self.next_waiter()
+            if waiter is None:
+                break
+            priority, future, started = waiter
+            self.tokens -= 1
+            self.record(priority, time.monotonic() - started)
+            future.set_result(None)
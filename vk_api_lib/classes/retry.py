@@ -0,0 +1,45 @@
+import random
+
+
+NETWORK_ERROR_CODE = -1
+
+
+def http_error_code(status: int) -> int:
+    return -status
+
+
+class RetryPolicy:
+    def __init__(
+            self,
+            attempts: int = 3,
+            base_delay: float = 0.3,
+            max_delay: float = 5,
+            error_codes: tuple[int, ...] = (6, 10),
+            retry_network: bool = True,
+            retry_server: bool = True):
+        self.attempts = attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.error_codes = set(error_codes)
+        self.retry_network = retry_network
+        self.retry_server = retry_server
+
+    def is_transient(self, error_code: int) -> bool:
+        if error_code in self.error_codes:
+            return True
+        if error_code == NETWORK_ERROR_CODE:
+            return self.retry_network
+        if http_error_code(599) <= error_code <= http_error_code(500):
+            return self.retry_server
+        return False
+
+    def should_retry(self, error_code: int, attempt: int) -> bool:
+        return attempt < self.attempts and self.is_transient(error_code)
+
+    def get_delay(self, attempt: int) -> float:
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+
+class NoRetryPolicy(RetryPolicy):
+    def should_retry(self, error_code: int, attempt: int) -> bool:
+        return False
@@ -0,0 +1,103 @@
+import json
+from collections import defaultdict
+
+from vk_api_lib.classes.FSM import FSMContext
+from vk_api_lib.classes.filters import Filter, TextFilter, CommandFilter, CallbackFilter, TopicFilter, StateFilter
+from vk_api_lib.classes.update import Update
+
+
+class Router:
+    def __init__(self, handlers: list['SuperHandler']):
+        self.handlers = handlers
+        self.size = None
+        self.texts: dict[str, list[int]] = defaultdict(list)
+        self.folded_texts: dict[str, list[int]] = defaultdict(list)
+        self.commands: dict[str, list[int]] = defaultdict(list)
+        self.types: dict[type, list[int]] = defaultdict(list)
+        self.topics: dict[int, list[int]] = defaultdict(list)
+        self.states: dict[str | None, list[int]] = defaultdict(list)
+        self.fallback: list[int] = []
+
+    def build(self) -> None:
+        for index in (self.texts, self.folded_texts, self.commands, self.types, self.topics, self.states):
+            index.clear()
+        self.fallback = []
+
+        for i, handler in enumerate(self.handlers):
+            if not self.index_handler(i, handler.filters):
+                self.fallback.append(i)
+        self.size = len(self.handlers)
+
+    def index_handler(self, i: int, filters: tuple[Filter, ...]) -> bool:
+        for filter_ in filters:
+            if type(filter_) is TextFilter:
+                index = self.texts if filter_.case_sensitive else self.folded_texts
+                for match in filter_.match_list:
+                    index[match if filter_.case_sensitive else match.lower()].append(i)
+                return True
+            elif type(filter_) is CommandFilter:
+                for match in filter_.match_list:
+                    self.commands[match].append(i)
+                return True
+            elif type(filter_) is CallbackFilter:
+                self.types[filter_.callback_data_class].append(i)
+                return True
+            elif type(filter_) is TopicFilter:
+                for topic_id in filter_.ids:
+                    self.topics[topic_id].append(i)
+                return True
+
+        for filter_ in filters:
+            if type(filter_) is StateFilter:
+                if not filter_.state_list:
+                    self.states[None].append(i)
+                for state in filter_.state_list:
+                    self.states[state.name].append(i)
+                return True
+
+        return False
+
+    @staticmethod
+    def get_command(update: Update) -> str | None:
+        payload = getattr(update, 'payload', None)
+        if not payload:
+            return None
+        try:
+            command = json.loads(payload)
+        except (TypeError, ValueError):
+            return None
+        if type(command) is not dict:
+            return None
+        return command.get('command')
+
+    async def get_handlers(self, update: Update, fsm: FSMContext) -> list['SuperHandler']:
+        if self.size != len(self.handlers):
+            self.build()
+
+        indexes = set(self.fallback)
+
+        if self.texts or self.folded_texts:
+            text = getattr(update, 'text', None)
+            if type(text) is str:
+                indexes.update(self.texts.get(text, ()))
+                indexes.update(self.folded_texts.get(text.lower(), ()))
+
+        if self.commands:
+            command = self.get_command(update)
+            if type(command) is str:
+                indexes.update(self.commands.get(command, ()))
+
+        if self.types:
+            callback_data = getattr(update, 'callback_data', None)
+            if callback_data:
+                indexes.update(self.types.get(type(callback_data), ()))
+
+        if self.topics:
+            topic_id = getattr(update, 'topic_id', None)
+            if topic_id is not None:
+                indexes.update(self.topics.get(topic_id, ()))
+
+        if self.states:
+            indexes.update(self.states.get(await fsm.get_state(), ()))
+
+        return [self.handlers[i] for i in sorted(indexes)]
@@ -6,3 +6,5 @@ VK_API_GET_MESSAGE_BY_CONSERVATION_ID_PATH = '/messages.getByConversationMessage
 VK_API_GET_UPLOAD_SERVER_PHOTO_PATH = '/photos.getMessagesUploadServer'
 VK_API_SAVE_MESSAGE_PHOTO_PATH = '/photos.saveMessagesPhoto'
 VK_API_GET_USERS_PATH = '/users.get'
+VK_API_EXECUTE_PATH = '/execute'
+VK_API_GET_LONG_POLL_SERVER_PATH = '/groups.getLongPollServer'